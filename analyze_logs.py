@@ -7,10 +7,22 @@ This file contains functions for analyzing XES logs:
 - Analyzing log attributes
 - Verifying case attributes
 - Analyzing case attribute values and distributions
+- Loading XES logs as event DataFrames through a parquet cache (shared by the analysis scripts)
 """
 
+import os
 import logging
-from pm4py.statistics.attributes.log import get as attributes_get
+from collections import defaultdict, Counter
+import pandas as pd
+from lxml import etree
+
+# The Rust-based XES importer is 5-6x faster than PM4Py's iterparse variant,
+# fall back to iterparse when the rustxes package is not installed
+try:
+    import rustxes  # noqa: F401
+    XES_IMPORT_VARIANT = "rustxes"
+except ImportError:
+    XES_IMPORT_VARIANT = "iterparse"
 
 # Configure logging
 logging.basicConfig(
@@ -19,17 +31,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Column of the activity names in PM4Py event DataFrames
+ACTIVITY_KEY = "concept:name"
+
+# Attribute value types PM4Py uses for nested attributes and lists, which cannot be put in a set
+UNHASHABLE_ATTRIBUTE_TYPES = (dict, list)
+
+def cached_log_path(file_path):
+    """Path of the parquet copy of an XES file, or None when there is no copy newer than the file"""
+    cache_path = file_path + ".parquet"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) > os.path.getmtime(file_path):
+        return cache_path
+    return None
+
+def load_event_log(file_path, columns=None, use_cache=True):
+    """
+    Load an XES file as an event DataFrame, through a parquet copy of the parsed log
+    
+    The parsed log is saved as <file>.parquet next to the XES file and read instead of
+    the XES file as long as the XES file has not changed since. Activity names are
+    stored as categories, as every distinct name repeats on many events.
+    
+    Args:
+        file_path: Path to the XES file
+        columns: Columns to return (all when None)
+        use_cache: Read and write the parquet copy
+        
+    Returns:
+        Event DataFrame
+    """
+    cache_path = cached_log_path(file_path) if use_cache else None
+    if cache_path is not None:
+        logger.info(f"Loading log: {file_path} (cached: {cache_path})")
+        return pd.read_parquet(cache_path, columns=columns)
+    
+    import pm4py
+    
+    logger.info(f"Loading log: {file_path} (variant: {XES_IMPORT_VARIANT})")
+    log = pm4py.read_xes(file_path, variant=XES_IMPORT_VARIANT, return_legacy_log_object=False)
+    log[ACTIVITY_KEY] = log[ACTIVITY_KEY].astype("category")
+    if use_cache:
+        try:
+            log.to_parquet(file_path + ".parquet")
+        except Exception as e:
+            # Caching is only an optimization (e.g. pyarrow may not be installed)
+            logger.warning(f"Could not cache log as {file_path}.parquet: {str(e)}")
+    return log if columns is None else log[columns]
+
 def count_events(log):
-    """Count events in a log in a memory-efficient way"""
-    return sum(len(case) for case in log)
+    """Count events in a log (EventLog or event DataFrame) in a memory-efficient way"""
+    if isinstance(log, pd.DataFrame):
+        # Event DataFrames hold one row per event
+        return len(log)
+    # map() keeps the per-case loop in C
+    return sum(map(len, log))
 
 def analyze_log_attributes(log):
     """Analyze all attributes in the log (event-level and case-level)"""
-    # Get event attributes
-    event_attributes = set()
+    # Get event attributes and their distinct values in a single pass over the log
+    distinct_values = defaultdict(set)
+    uncountable_attributes = set()
     for case in log:
         for event in case:
-            event_attributes.update(event.keys())
+            for key, value in event.items():
+                if isinstance(value, UNHASHABLE_ATTRIBUTE_TYPES):
+                    # Nested attributes and lists cannot be counted
+                    uncountable_attributes.add(key)
+                else:
+                    distinct_values[key].add(value)
+    event_attributes = set(distinct_values) | uncountable_attributes
     
     # Get trace/case attributes (using a more memory-efficient approach)
     trace_attributes = set()
@@ -43,13 +113,12 @@ def analyze_log_attributes(log):
     logger.info(f"Event attributes ({len(event_attributes)}): {sorted(event_attributes)}")
     logger.info(f"Case attributes ({len(trace_attributes)}): {sorted(trace_attributes)}")
     
-    # Count the number of distinct values for each event attribute
+    # Report the number of distinct values for each event attribute
     for attr in event_attributes:
-        try:
-            values = attributes_get.get_attribute_values(log, attr)
-            logger.info(f"  - {attr}: {len(values)} distinct values")
-        except:
+        if attr in uncountable_attributes:
             logger.info(f"  - {attr}: Unable to count distinct values")
+        else:
+            logger.info(f"  - {attr}: {len(distinct_values[attr])} distinct values")
     
     return event_attributes, trace_attributes
 
@@ -86,24 +155,17 @@ def analyze_case_attribute_values(log, attribute_name, max_sample=1000):
         max_sample: Maximum number of cases to sample (for large logs)
         
     Returns:
-        Dictionary with values as keys and counts as values
+        Counter with values as keys and counts as values
     """
-    value_counts = {}
-    
     # Use a sample of cases for very large logs
     sample = log
     if len(log) > max_sample:
         sample = log[:max_sample]
         logger.info(f"Using a sample of {max_sample} cases to analyze '{attribute_name}'")
 
-    # Iterate through cases and count attribute values
-    missing_count = 0
-    for case in sample:
-        try:
-            value = case.attributes[attribute_name]
-            value_counts[value] = value_counts.get(value, 0) + 1
-        except KeyError:
-            missing_count += 1
+    # Count attribute values of the cases that have the attribute
+    value_counts = Counter(case.attributes[attribute_name] for case in sample if attribute_name in case.attributes)
+    missing_count = len(sample) - sum(value_counts.values())
     
     logger.info(f"Analysis of '{attribute_name}':")
     logger.info(f"  - Found {len(value_counts)} distinct values")
@@ -112,28 +174,80 @@ def analyze_case_attribute_values(log, attribute_name, max_sample=1000):
     
     # Print the most common values
     if value_counts:
-        sorted_values = sorted(value_counts.items(), key=lambda x: x[1], reverse=True)
-        top_n = min(10, len(sorted_values))
-        logger.info(f"  - Top {top_n} most frequent values:")
-        for value, count in sorted_values[:top_n]:
+        top_values = value_counts.most_common(10)
+        logger.info(f"  - Top {len(top_values)} most frequent values:")
+        for value, count in top_values:
             logger.info(f"    - '{value}': {count} cases ({count/len(sample)*100:.1f}%)")
     
     return value_counts
 
-def analyze_xes_file(file_path):
+def stream_xes_stats(file_path):
+    """
+    Count cases and events and collect the attribute names of an XES file without loading it
+    
+    The file is parsed incrementally and each trace is discarded once it has been read,
+    so memory use stays constant regardless of the size of the log.
+    
+    Args:
+        file_path: Path to the XES file
+        
+    Returns:
+        Tuple of (case_count, event_count, event_attributes, trace_attributes)
+    """
+    case_count = 0
+    event_count = 0
+    event_attributes = set()
+    trace_attributes = set()
+    
+    for _, elem in etree.iterparse(file_path, events=("end",), tag=("{*}event", "{*}trace")):
+        if etree.QName(elem).localname == "event":
+            event_count += 1
+            event_attributes.update(child.get("key") for child in elem)
+            elem.clear()
+            continue
+        
+        # The direct children of a trace that are not events are its attributes
+        case_count += 1
+        trace_attributes.update(child.get("key") for child in elem if etree.QName(child).localname != "event")
+        
+        # Drop the trace and everything parsed before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    event_attributes.discard(None)
+    trace_attributes.discard(None)
+    return case_count, event_count, event_attributes, trace_attributes
+
+def analyze_xes_file(file_path, analyze_values=True):
     """
     Analyze an XES file and output key information
     
     Args:
         file_path: Path to the XES file
+        analyze_values: Also analyze attribute values and the time range, which requires
+            loading the full log. When False, only counts and attribute names are
+            collected with a streaming pass over the file.
     """
     import pm4py
     
     logger.info(f"Analyzing XES file: {file_path}")
     
+    if not analyze_values:
+        case_count, event_count, event_attrs, case_attrs = stream_xes_stats(file_path)
+        logger.info(f"Log contains {case_count} cases and {event_count} events")
+        logger.info(f"Event attributes ({len(event_attrs)}): {sorted(event_attrs)}")
+        logger.info(f"Case attributes ({len(case_attrs)}): {sorted(case_attrs)}")
+        return {
+            "case_count": case_count,
+            "event_count": event_count,
+            "event_attributes": list(event_attrs),
+            "case_attributes": list(case_attrs)
+        }
+    
     try:
-        # Import the log
-        log = pm4py.read_xes(file_path)
+        # Import the log (the analysis helpers below iterate over cases, so keep the EventLog object)
+        log = pm4py.read_xes(file_path, variant=XES_IMPORT_VARIANT, return_legacy_log_object=True)
         
         # Basic statistics
         case_count = len(log)
@@ -148,8 +262,8 @@ def analyze_xes_file(file_path):
             min_ts = min(pm4py.get_event_attribute_values(log, "time:timestamp"))
             max_ts = max(pm4py.get_event_attribute_values(log, "time:timestamp"))
             logger.info(f"Time range: {min_ts} to {max_ts}")
-        except:
-            logger.warning("Could not determine time range")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Could not determine time range ({type(e).__name__}: {str(e)})")
         
         # Analyze common case attributes
         for attr in case_attrs:
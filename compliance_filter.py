@@ -19,16 +19,24 @@ For each category, specific compliance rules are applied based on:
 """
 
 import os
+import re
 import sys
+import gzip
 import logging
+import multiprocessing
 import traceback
 from datetime import datetime
+from enum import IntEnum
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
 import pm4py
-from pm4py.objects.log.obj import EventLog, Trace
-from pm4py.objects.log.importer.xes import importer as xes_importer
-from pm4py.objects.log.exporter.xes import exporter as xes_exporter
 import json
+from xml.sax.saxutils import quoteattr
+from lxml import etree
+from analyze_logs import XES_IMPORT_VARIANT, load_event_log
 
 # Configure logging
 logging.basicConfig(
@@ -46,6 +54,59 @@ INPUT_DIR = './data/filtered'
 OUTPUT_DIR = './data/filtered'
 COMPLIANT_DIR = os.path.join(OUTPUT_DIR, 'compliant')
 NON_COMPLIANT_DIR = os.path.join(OUTPUT_DIR, 'non_compliant')
+STATS_DIR = os.path.join(OUTPUT_DIR, 'stats')
+
+# Keep a parquet copy of every parsed XES log next to it, later runs read that instead
+# of parsing the XES again (as long as the XES file has not changed since)
+CACHE_PARSED_LOGS = True
+
+# Copy the traces of the compliant and non-compliant cases verbatim from the source XES
+# file instead of writing them from the parsed log. Streaming keeps the log header and
+# needs no second copy of the log in memory, but it parses the XES file once more, even
+# when the log itself was read from its parquet copy, which makes the whole run about 15%
+# slower. Without rustxes the output is always streamed, as PM4Py's own exporter would
+# convert the whole log to Python objects first.
+STREAM_XES_OUTPUT = False
+
+# Output settings: write gzip-compressed logs (.xes.gz)
+COMPRESS_OUTPUT = False
+XES_LOG_CLOSING_TAG = b"</log>\n"
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Number of XES files processed concurrently (loading and writing spend most of their
+# time in the rustxes/lxml parsers), at most one per CPU
+FILE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Parallel compliance checking: large logs are split into chunks of whole cases,
+# one per worker process; smaller logs are checked in the main process. The CPUs are
+# shared by the files processed concurrently, so all pools together stay within the CPU count
+COMPLIANCE_WORKERS = max(1, (os.cpu_count() or 1) // FILE_WORKERS)
+MIN_CASES_PER_WORKER = 50000
+
+# The worker processes are started from the file threads, forking a process with several
+# running threads can leave a lock of another thread held in the child, so start them
+# from a clean server process instead (spawn where forkserver is not available, e.g. Windows)
+COMPLIANCE_START_METHODS = ("forkserver", "spawn")
+
+# Column names of the PM4Py event DataFrame
+CASE_ID_KEY = "case:concept:name"
+ACTIVITY_KEY = "concept:name"
+CUMULATIVE_VALUE_KEY = "Cumulative net worth (EUR)"
+PO_ITEM_VALUE_COLUMN = "case:PO item value"
+
+# Case flags checked by the compliance rules. The BPI 2019 log spells the GR-based flag
+# "GR-Based", the other spellings are read into that column as well
+GR_BASED_FLAG = "GR-Based Inv. Verif."
+GR_BASED_FLAG_ALIASES = ["GR-based Inv. Verif."]
+GOODS_RECEIPT_FLAG = "Goods Receipt"
+
+# Case attributes used by the compliance rules
+CASE_ATTRIBUTE_COLUMNS = [
+    "case:GR-Based Inv. Verif.",
+    "case:GR-based Inv. Verif.",
+    "case:Goods Receipt",
+    PO_ITEM_VALUE_COLUMN,
+]
 
 # Item categories and their compliance rules
 ITEM_CATEGORIES = {
@@ -55,6 +116,12 @@ ITEM_CATEGORIES = {
     "consignment": ["Consignment"]
 }
 
+# Matches the item category in a log filename (e.g. "group_3_way_after.xes")
+CATEGORY_FILENAME_PATTERN = re.compile(
+    "|".join(re.escape(category) for category in ITEM_CATEGORIES),
+    re.IGNORECASE
+)
+
 # Activity patterns for compliance checking
 ACTIVITY_PATTERNS = {
     # Core activities that indicate goods receipt
@@ -86,124 +153,190 @@ ACTIVITY_PATTERNS = {
     ]
 }
 
+# Lowercased patterns, precomputed once for exact case-insensitive matching
+ACTIVITY_PATTERN_SETS = {
+    key: frozenset(pattern.lower() for pattern in patterns)
+    for key, patterns in ACTIVITY_PATTERNS.items()
+}
+
+class Reason(IntEnum):
+    """Non-compliance reasons, used as violation column labels and statistics keys"""
+    NO_INVOICE_FOR_VALUE_VALIDATION = 1
+    NO_GOODS_RECEIPT_FOR_VALUE_VALIDATION = 2
+    GR_COUNT_MISMATCH = 3
+    NO_CUMULATIVE_VALUES = 4
+    PO_VALUE_MISMATCH = 5
+    PO_VALUE_ZERO = 6
+    CUMULATIVE_VALUE_ZERO = 7
+    INVOICE_VALUE_MISMATCH = 8
+    INVOICE_VALUE_ZERO = 9
+    MISSING_GOODS_RECEIPT = 10
+    MISSING_INVOICE_RECEIPT = 11
+    INVOICE_BEFORE_GOODS_RECEIPT = 12
+    GR_BASED_FLAG_NOT_TRUE = 13
+    GR_BASED_FLAG_NOT_FALSE = 14
+    GOODS_RECEIPT_FLAG_NOT_TRUE = 15
+    GOODS_RECEIPT_FLAG_NOT_FALSE = 16
+    MISSING_PAYMENT_BLOCK = 17
+    PAYMENT_BLOCK_NOT_REMOVED = 18
+    PAYMENT_BLOCK_REMOVED_BEFORE_SET = 19
+    PAYMENT_BLOCK_REMOVED_BEFORE_GOODS_RECEIPT = 20
+    INVOICE_AT_PO_LEVEL = 21
+
+# Human-readable reason messages, used for reporting only
+REASON_MESSAGES = {
+    Reason.NO_INVOICE_FOR_VALUE_VALIDATION: "No invoice receipts found for value validation",
+    Reason.NO_GOODS_RECEIPT_FOR_VALUE_VALIDATION: "No goods receipts found for value validation",
+    Reason.GR_COUNT_MISMATCH: "Number of goods receipts does not equal number of invoice receipts",
+    Reason.NO_CUMULATIVE_VALUES: "No cumulative values found for validation",
+    Reason.PO_VALUE_MISMATCH: "PO item value does not match expected value from invoice receipts",
+    Reason.PO_VALUE_ZERO: "PO item value is zero, which may indicate invalid data",
+    Reason.CUMULATIVE_VALUE_ZERO: "Cumulative value is zero but PO item value is non-zero",
+    Reason.INVOICE_VALUE_MISMATCH: "Invoice value does not match PO item value",
+    Reason.INVOICE_VALUE_ZERO: "Invoice value is zero but PO item value is non-zero",
+    Reason.MISSING_GOODS_RECEIPT: "Missing goods receipt activity",
+    Reason.MISSING_INVOICE_RECEIPT: "Missing invoice receipt activity",
+    Reason.INVOICE_BEFORE_GOODS_RECEIPT: "Invoice received before goods receipt",
+    Reason.GR_BASED_FLAG_NOT_TRUE: "GR-based invoice verification flag is not set to true",
+    Reason.GR_BASED_FLAG_NOT_FALSE: "GR-based invoice verification flag is not set to false",
+    Reason.GOODS_RECEIPT_FLAG_NOT_TRUE: "Goods receipt flag is not set to true",
+    Reason.GOODS_RECEIPT_FLAG_NOT_FALSE: "Goods receipt flag is not set to false",
+    Reason.MISSING_PAYMENT_BLOCK: "Missing payment block activity",
+    Reason.PAYMENT_BLOCK_NOT_REMOVED: "Payment block was not removed, which is not allowed",
+    Reason.PAYMENT_BLOCK_REMOVED_BEFORE_SET: "Payment block was removed before it was set",
+    Reason.PAYMENT_BLOCK_REMOVED_BEFORE_GOODS_RECEIPT: "Payment block was removed before goods receipt",
+    Reason.INVOICE_AT_PO_LEVEL: "Invoice receipt activity found at purchase order level, which is not allowed for consignment",
+}
+
 # ---------------------------
 # HELPER FUNCTIONS
 # ---------------------------
 
 def load_log(log_file_path):
-    """Load an XES log file with error handling"""
+    """Load an XES log file as an event DataFrame with error handling"""
     try:
-        logger.info(f"Loading log: {log_file_path}")
-        log = xes_importer.apply(log_file_path)
-        logger.info(f"Log loaded with {len(log)} cases and {sum(len(case) for case in log)} events")
+        log = load_event_log(log_file_path, use_cache=CACHE_PARSED_LOGS)
+        # The case count is only known after the compliance check factorizes the case ids,
+        # counting distinct ids here would hash every event once more just for this message
+        logger.info(f"Log loaded with {len(log)} events")
         return log
     except Exception as e:
         logger.error(f"Error loading log {log_file_path}: {str(e)}")
         raise
 
-def save_log(log, output_path):
-    """Save an XES log file with error handling"""
-    try:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        xes_exporter.apply(log, output_path)
-        logger.info(f"Saved {len(log)} cases to {output_path}")
-    except Exception as e:
-        logger.error(f"Error saving log {output_path}: {str(e)}")
-        raise
+def open_output(output_path):
+    """Open an XES output file for writing, gzip-compressed when the path ends with .gz"""
+    if output_path.endswith(".gz"):
+        return gzip.open(output_path, "wb")
+    # Traces are written one by one, a large buffer turns them into few big writes
+    return open(output_path, "wb", buffering=OUTPUT_BUFFER_SIZE)
 
-def get_activity_names(case):
-    """Extract activity names from a case"""
-    return [event["concept:name"] for event in case if "concept:name" in event]
-
-def get_activity_timestamps(case):
-    """Extract activity timestamps from a case"""
-    timestamps = []
-    for event in case:
-        if "time:timestamp" in event:
-            timestamps.append(event["time:timestamp"])
-    return timestamps
-
-def has_activity_pattern(activities, patterns):
-    """Check if any activity matches the given patterns"""
-    for activity in activities:
-        for pattern in patterns:
-            if pattern.lower() in activity.lower():
-                return True
-    return False
-
-def get_matching_activities(activities, patterns):
-    """Get all activities that match the given patterns"""
-    matching = []
-    for activity in activities:
-        for pattern in patterns:
-            if pattern.lower() in activity.lower():
-                matching.append(activity)
-                break
-    return matching
-
-def get_activity_positions(activities, patterns):
-    """Get positions of activities that match the given patterns"""
-    positions = []
-    for i, activity in enumerate(activities):
-        for pattern in patterns:
-            if pattern.lower() in activity.lower():
-                positions.append(i)
-                break
-    return positions
-
-def check_sequence_constraint(activities, first_patterns, second_patterns):
-    """Check if activities matching first_patterns occur before activities matching second_patterns"""
-    first_positions = get_activity_positions(activities, first_patterns)
-    second_positions = get_activity_positions(activities, second_patterns)
-    
-    if not first_positions or not second_positions:
-        return True  # Cannot violate constraint if one of the activity types is missing
-    
-    # Check if all first activities occur before all second activities
-    max_first = max(first_positions)
-    min_second = min(second_positions)
-    
-    return max_first < min_second
-
-def get_case_attributes(case):
-    """Extract case-level attributes"""
-    attributes = {}
-    if hasattr(case, 'attributes'):
-        attributes = dict(case.attributes)
-    return attributes
-
-def get_cumulative_values(case):
-    """Extract cumulative net worth values from events"""
-    values = []
-    for event in case:
-        if "Cumulative net worth (EUR)" in event:
-            values.append(event["Cumulative net worth (EUR)"])
-    return values
-
-def get_po_item_value(case):
-    """Extract PO item value from case attributes or first event"""
-    # Try to get from case attributes first
-    attributes = get_case_attributes(case)
-    if "PO item value" in attributes:
-        return attributes["PO item value"]
-    
-    # If not in attributes, get from first event with cumulative value
-    values = get_cumulative_values(case)
-    if values:
-        return values[0]
-    return 0
-
-def count_activity_occurrences(activities, patterns):
-    """Count how many times activities matching patterns occur"""
-    count = 0
-    for activity in activities:
-        for pattern in patterns:
-            if pattern.lower() in activity.lower():
-                count += 1
-                break
-    return count
-
-def check_3way_value_compliance(case):
+def category_from_filename(filename):
+    """Return the item category a log file belongs to, or None if it cannot be determined"""
+    match = CATEGORY_FILENAME_PATTERN.search(filename)
+    return match.group(0).lower() if match else None
+
+def match_activity_pattern(activities, pattern_key):
+    """Flag the (lowercased) activities that exactly match one of the patterns of the given key"""
+    return activities.isin(ACTIVITY_PATTERN_SETS[pattern_key])
+
+def extract_case_features(log):
+    """
+    Aggregate the event DataFrame into one row of compliance features per case
+
+    The compliance rules only need a few facts per case: how often the goods receipt,
+    invoice receipt and payment block removal activities occur, where they occur, the
+    first and final cumulative value and some case attributes. These are computed
+    column-wise from a single grouping of the events by case instead of walking every
+    case in Python.
+
+    Args:
+        log: Event DataFrame as returned by load_log
+
+    Returns:
+        DataFrame indexed by case id
+    """
+    cases = log.groupby(CASE_ID_KEY, sort=False)
+    position = cases.cumcount().to_numpy()
+    case_codes = cases.ngroup().to_numpy()
+
+    # One row per case in order of first appearance, i.e. in the order of the case codes
+    first_events = position == 0
+    features = pd.DataFrame(index=pd.Index(log[CASE_ID_KEY][first_events], name=CASE_ID_KEY))
+
+    # Lowercase and match every distinct activity name once, then broadcast the result to
+    # the events through their codes (events without a name get code -1, i.e. no match)
+    activity_codes, activity_names = pd.factorize(log[ACTIVITY_KEY])
+    activity_names = activity_names.str.lower()
+
+    def events_matching(pattern_key):
+        return np.append(match_activity_pattern(activity_names, pattern_key), False)[activity_codes]
+
+    is_goods_receipt = events_matching("goods_receipt")
+    is_invoice_receipt = events_matching("invoice_receipt")
+    is_payment_block_removed = events_matching("payment_block_removed")
+
+    # Number of matching events per case
+    features['gr_count'] = np.bincount(case_codes[is_goods_receipt], minlength=len(features))
+    features['invoice_count'] = np.bincount(case_codes[is_invoice_receipt], minlength=len(features))
+    features['payment_block_removed_count'] = np.bincount(case_codes[is_payment_block_removed], minlength=len(features))
+
+    # Case attributes are repeated on every event of a case, read them from its first event
+    for column in CASE_ATTRIBUTE_COLUMNS:
+        if column in log:
+            features[column] = log[column].to_numpy()[first_events]
+    
+    # Coalesce the spellings of the GR-based flag into a single column
+    gr_based_column = f"case:{GR_BASED_FLAG}"
+    for alias in GR_BASED_FLAG_ALIASES:
+        alias_values = features.pop(f"case:{alias}") if f"case:{alias}" in features else None
+        if alias_values is not None:
+            features[gr_based_column] = features[gr_based_column].fillna(alias_values) if gr_based_column in features else alias_values
+
+    # Only the first or last value of some events of a case matters. np.unique returns the
+    # index of the first occurrence of every case code among the selected events (in event
+    # order), on the reversed events that is the last one (case codes follow the order of the
+    # features index, cases without such an event stay NaN)
+    def case_value(values, is_selected, last):
+        case_values = np.full(len(features), np.nan)
+        codes, selected = case_codes[is_selected], values[is_selected]
+        if last:
+            codes, selected = codes[::-1], selected[::-1]
+        case_slots, first_indices = np.unique(codes, return_index=True)
+        case_values[case_slots] = selected[first_indices]
+        return case_values
+
+    features['last_gr_pos'] = case_value(position, is_goods_receipt, last=True)
+    features['first_invoice_pos'] = case_value(position, is_invoice_receipt, last=False)
+    features['first_payment_block_removed_pos'] = case_value(position, is_payment_block_removed, last=False)
+
+    # First and final value of the events that carry a cumulative value
+    cumulative_value = log[CUMULATIVE_VALUE_KEY].to_numpy(dtype=float, na_value=np.nan) if CUMULATIVE_VALUE_KEY in log else np.full(len(log), np.nan)
+    has_cumulative_value = ~np.isnan(cumulative_value)
+    features['first_cumulative_value'] = case_value(cumulative_value, has_cumulative_value, last=False)
+    features['final_cumulative_value'] = case_value(cumulative_value, has_cumulative_value, last=True)
+
+    # PO item value from the case attributes, otherwise from the first event with a cumulative value
+    po_item_value = features[PO_ITEM_VALUE_COLUMN] if PO_ITEM_VALUE_COLUMN in features else np.nan
+    features['po_item_value'] = pd.Series(po_item_value, index=features.index).fillna(features['first_cumulative_value']).fillna(0)
+    return features
+
+def case_flag_matches(features, attribute, expected, missing_passes=False):
+    """
+    Check a boolean case attribute against "true"/"false"
+    
+    Cases without the attribute (or logs without the column) fail the check, unless
+    missing_passes is set.
+    """
+    column = f"case:{attribute}"
+    if column not in features:
+        return pd.Series(missing_passes, index=features.index)
+    # Compare each distinct flag value once (missing values get code -1, i.e. the missing policy)
+    value_codes, values = pd.factorize(features[column])
+    value_matches = values.astype(str).str.lower() == expected
+    return pd.Series(np.append(value_matches, missing_passes)[value_codes], index=features.index)
+
+def check_3way_value_compliance(features):
     """
     Check value compliance for 3-way match cases
     Rules:
@@ -211,87 +344,66 @@ def check_3way_value_compliance(case):
     - Cumulated value of GRs = Cumulated value of invoice receipts  
     - Number of GRs = Number of invoice receipts
     """
-    activities = get_activity_names(case)
-    po_item_value = get_po_item_value(case)
-    
-    # Count invoice receipts and goods receipts
-    invoice_count = count_activity_occurrences(activities, ACTIVITY_PATTERNS["invoice_receipt"])
-    gr_count = count_activity_occurrences(activities, ACTIVITY_PATTERNS["goods_receipt"])
-    
-    violations = []
+    invoice_count = features['invoice_count']
+    gr_count = features['gr_count']
+    po_item_value = features['po_item_value']
+    final_cumulative_value = features['final_cumulative_value']
+    violations = pd.DataFrame(index=features.index)
     
     # Check if we have the required activities to validate
-    if invoice_count == 0:
-        violations.append("No invoice receipts found for value validation")
-        return violations
+    no_invoice = invoice_count == 0
+    violations[Reason.NO_INVOICE_FOR_VALUE_VALIDATION] = no_invoice
     
-    if gr_count == 0:
-        violations.append("No goods receipts found for value validation")
-        return violations
+    no_goods_receipt = ~no_invoice & (gr_count == 0)
+    violations[Reason.NO_GOODS_RECEIPT_FOR_VALUE_VALIDATION] = no_goods_receipt
+    validated = ~no_invoice & ~no_goods_receipt
     
     # Rule: Number of GRs = Number of invoice receipts
-    if gr_count != invoice_count:
-        violations.append(f"Number of goods receipts does not equal number of invoice receipts")
+    violations[Reason.GR_COUNT_MISMATCH] = validated & (gr_count != invoice_count)
     
     # Get cumulative values for validation
-    cumulative_values = get_cumulative_values(case)
-    if not cumulative_values:
-        violations.append("No cumulative values found for validation")
-        return violations
-    
-    # Use the final cumulative value as the total
-    final_cumulative_value = cumulative_values[-1]
+    violations[Reason.NO_CUMULATIVE_VALUES] = validated & final_cumulative_value.isna()
+    validated &= final_cumulative_value.notna()
     
     # Rule: PO item value = Cumulated value of invoice receipts ÷ number of invoice receipts
-    if invoice_count > 0:
-        expected_po_value = final_cumulative_value / invoice_count
-        if abs(po_item_value - expected_po_value) > 0.01:  # Allow small floating point differences
-            violations.append(f"PO item value does not match expected value from invoice receipts")
+    expected_po_value = final_cumulative_value / invoice_count.where(invoice_count > 0)
+    violations[Reason.PO_VALUE_MISMATCH] = validated & ((po_item_value - expected_po_value).abs() > 0.01)  # Allow small floating point differences
     
     # Check for zero values which typically indicate non-compliance
-    if po_item_value == 0:
-        violations.append("PO item value is zero, which may indicate invalid data")
-    
-    if final_cumulative_value == 0 and po_item_value != 0:
-        violations.append("Cumulative value is zero but PO item value is non-zero")
+    violations[Reason.PO_VALUE_ZERO] = validated & (po_item_value == 0)
+    violations[Reason.CUMULATIVE_VALUE_ZERO] = validated & (final_cumulative_value == 0) & (po_item_value != 0)
     
     return violations
 
-def check_2way_value_compliance(case):
+def check_2way_value_compliance(features):
     """
     Check value compliance for 2-way match cases
     Rules:
     - Invoice value must match original PO item value
     """
-    po_item_value = get_po_item_value(case)
-    cumulative_values = get_cumulative_values(case)
-    
-    violations = []
+    po_item_value = features['po_item_value']
+    final_cumulative_value = features['final_cumulative_value']
+    violations = pd.DataFrame(index=features.index)
     
-    if not cumulative_values:
-        violations.append("No cumulative values found for validation")
-        return violations
-    
-    final_cumulative_value = cumulative_values[-1]
+    violations[Reason.NO_CUMULATIVE_VALUES] = final_cumulative_value.isna()
+    validated = final_cumulative_value.notna()
     
     # Rule: Invoice value must match PO item value
-    if abs(po_item_value - final_cumulative_value) > 0.01:  # Allow small floating point differences
-        violations.append(f"Invoice value does not match PO item value")
+    violations[Reason.INVOICE_VALUE_MISMATCH] = validated & ((po_item_value - final_cumulative_value).abs() > 0.01)  # Allow small floating point differences
     
     # Check for zero values
-    if po_item_value == 0:
-        violations.append("PO item value is zero, which may indicate invalid data")
-    
-    if final_cumulative_value == 0 and po_item_value != 0:
-        violations.append("Invoice value is zero but PO item value is non-zero")
+    violations[Reason.PO_VALUE_ZERO] = validated & (po_item_value == 0)
+    violations[Reason.INVOICE_VALUE_ZERO] = validated & (final_cumulative_value == 0) & (po_item_value != 0)
     
     return violations
 
 # ---------------------------
 # COMPLIANCE CHECKING FUNCTIONS
 # ---------------------------
+# Each checker takes the per-case features from extract_case_features and returns a
+# boolean DataFrame with one column per violation Reason, indexed by case id.
 
-def check_3way_after_compliance(case):
+def check_3way_after_compliance(features):
     """
     Check compliance for 3-way match, invoice after GR cases
     
@@ -303,48 +415,27 @@ def check_3way_after_compliance(case):
     5. Goods receipt flag must be true
     6. Values must match (item, goods receipt, invoice)
     """
-    activities = get_activity_names(case)
-    attributes = get_case_attributes(case)
-    violations = []
+    violations = pd.DataFrame(index=features.index)
     
     # Rule 1: Check for goods receipt
-    has_goods_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["goods_receipt"])
-    if not has_goods_receipt:
-        violations.append("Missing goods receipt activity")
+    violations[Reason.MISSING_GOODS_RECEIPT] = features['gr_count'] == 0
     
     # Rule 2: Check for invoice receipt
-    has_invoice_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["invoice_receipt"])
-    if not has_invoice_receipt:
-        violations.append("Missing invoice receipt activity")
-    
-    # Rule 3: Check sequence - goods receipt before invoice
-    sequence_ok = check_sequence_constraint(
-        activities, 
-        ACTIVITY_PATTERNS["goods_receipt"],
-        ACTIVITY_PATTERNS["invoice_receipt"]
-    )
-    if not sequence_ok:
-        violations.append("Invoice received before goods receipt")
+    violations[Reason.MISSING_INVOICE_RECEIPT] = features['invoice_count'] == 0
+    
+    # Rule 3: Check sequence - goods receipt before invoice (cannot be violated if either is missing)
+    violations[Reason.INVOICE_BEFORE_GOODS_RECEIPT] = features['last_gr_pos'] >= features['first_invoice_pos']
 
     # Rule 4: GR-based flag check
-    has_gr_flag = str(attributes.get("GR-Based Inv. Verif.", "true")).lower() == "true"
-    if not has_gr_flag:
-        violations.append("GR-based invoice verification flag is not set to true")
+    violations[Reason.GR_BASED_FLAG_NOT_TRUE] = ~case_flag_matches(features, GR_BASED_FLAG, "true")
     
     # Rule 5: check goods receipt flag is true
-    has_gr_flag = str(attributes.get("Goods Receipt", "true")).lower() == "true"
-    if not has_gr_flag:
-        violations.append("Goods receipt flag is not set to true")
+    violations[Reason.GOODS_RECEIPT_FLAG_NOT_TRUE] = ~case_flag_matches(features, GOODS_RECEIPT_FLAG, "true")
 
     # Rule 6: Value matching using 3-way specific rules
-    value_violations = check_3way_value_compliance(case)
-    violations.extend(value_violations)
-        
-    if violations:
-        return False, violations
-    return True, ["Compliant"]
+    return violations.join(check_3way_value_compliance(features))
 
-def check_3way_before_compliance(case):
+def check_3way_before_compliance(features):
     """
     Check compliance for 3-way match, invoice before GR cases
     
@@ -359,67 +450,36 @@ def check_3way_before_compliance(case):
     8. Payment block must be removed after Record Goods Receipt
     9. Values must match (creation, invoice, goods-receipt)
     """
-    activities = get_activity_names(case)
-    attributes = get_case_attributes(case)
-    violations = []
+    violations = pd.DataFrame(index=features.index)
     
     # Rule 1: Check for goods receipt
-    has_goods_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["goods_receipt"])
-    if not has_goods_receipt:
-        violations.append("Missing goods receipt activity")
+    violations[Reason.MISSING_GOODS_RECEIPT] = features['gr_count'] == 0
     
     # Rule 2: Check for invoice receipt
-    has_invoice_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["invoice_receipt"])
-    if not has_invoice_receipt:
-        violations.append("Missing invoice receipt activity")
+    violations[Reason.MISSING_INVOICE_RECEIPT] = features['invoice_count'] == 0
     
     # Rule 3: GR-based flag check
-    has_gr_flag = str(attributes.get("GR-based Inv. Verif.", "false")).lower() == "false"
-    if not has_gr_flag:
-        violations.append("GR-based invoice verification flag is not set to false")
+    violations[Reason.GR_BASED_FLAG_NOT_FALSE] = ~case_flag_matches(features, GR_BASED_FLAG, "false")
     
     # Rule 4: check goods receipt flag is true
-    has_gr_flag = str(attributes.get("Goods Receipt", "true")).lower() == "true"
-    if not has_gr_flag:
-        violations.append("Goods receipt flag is not set to true")
+    violations[Reason.GOODS_RECEIPT_FLAG_NOT_TRUE] = ~case_flag_matches(features, GOODS_RECEIPT_FLAG, "true")
 
     # # Rule 5: Check if the payment block is present
-    # has_payment = has_activity_pattern(activities, ACTIVITY_PATTERNS["set_payment_block"])
-    # if not has_payment:
-    #     violations.append("Missing payment block activity")
+    # violations[Reason.MISSING_PAYMENT_BLOCK] = features['payment_block_set_count'] == 0
     
     # Rule 6: Check if the payment block was removed
-    has_payment_removed = has_activity_pattern(activities, ACTIVITY_PATTERNS["payment_block_removed"])
-    if not has_payment_removed:
-        violations.append("Payment block was not removed, which is not allowed")
+    violations[Reason.PAYMENT_BLOCK_NOT_REMOVED] = features['payment_block_removed_count'] == 0
     
     # # Rule 7: Check sequence - payment block must be set before it is removed
-    # sequence_ok = check_sequence_constraint(
-    #     activities, 
-    #     ACTIVITY_PATTERNS["set_payment_block"],
-    #     ACTIVITY_PATTERNS["payment_block_removed"]
-    # )
-    # if not sequence_ok:
-    #     violations.append("Payment block was removed before it was set")
+    # violations[Reason.PAYMENT_BLOCK_REMOVED_BEFORE_SET] = features['last_payment_block_set_pos'] >= features['first_payment_block_removed_pos']
 
     # Rule 8: Check sequence - payment block must be removed after goods receipt
-    sequence_ok = check_sequence_constraint(
-        activities, 
-        ACTIVITY_PATTERNS["goods_receipt"],
-        ACTIVITY_PATTERNS["payment_block_removed"]
-    )
-    if not sequence_ok:
-        violations.append("Payment block was removed before goods receipt")
+    violations[Reason.PAYMENT_BLOCK_REMOVED_BEFORE_GOODS_RECEIPT] = features['last_gr_pos'] >= features['first_payment_block_removed_pos']
 
     # Rule 9: Value matching using 3-way specific rules
-    value_violations = check_3way_value_compliance(case)
-    violations.extend(value_violations)
-    
-    if violations:
-        return False, violations
-    return True, ["Compliant"]
+    return violations.join(check_3way_value_compliance(features))
 
-def check_2way_compliance(case):
+def check_2way_compliance(features):
     """
     Check compliance for 2-way match cases
     
@@ -429,34 +489,21 @@ def check_2way_compliance(case):
     3. Goods receipt should be set to false
     4. Invoice value must match original item value
     """
-    activities = get_activity_names(case)
-    attributes = get_case_attributes(case)
-    violations = []
+    violations = pd.DataFrame(index=features.index)
     
     # Rule 1: Check for invoice receipt
-    has_invoice_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["invoice_receipt"])
-    if not has_invoice_receipt:
-        violations.append("Missing invoice receipt activity")
+    violations[Reason.MISSING_INVOICE_RECEIPT] = features['invoice_count'] == 0
 
     # Rule 2: GR-based flag check
-    has_gr_flag = str(attributes.get("GR-based Inv. Verif.", "false")).lower() == "false"
-    if not has_gr_flag:
-        violations.append("GR-based invoice verification flag is not set to false")
+    violations[Reason.GR_BASED_FLAG_NOT_FALSE] = ~case_flag_matches(features, GR_BASED_FLAG, "false")
 
     # Rule 3: check goods receipt flag is false
-    has_gr_flag = str(attributes.get("Goods Receipt", "false")).lower() == "false"
-    if not has_gr_flag:
-        violations.append("Goods receipt flag is not set to false")
+    violations[Reason.GOODS_RECEIPT_FLAG_NOT_FALSE] = ~case_flag_matches(features, GOODS_RECEIPT_FLAG, "false")
     
     # Rule 4: Invoice value must match original item value using 2-way specific rules
-    value_violations = check_2way_value_compliance(case)
-    violations.extend(value_violations)
-    
-    if violations:
-        return False, violations
-    return True, ["Compliant"]
+    return violations.join(check_2way_value_compliance(features))
 
-def check_consignment_compliance(case):
+def check_consignment_compliance(features):
     """
     Check compliance for consignment cases
     
@@ -467,53 +514,82 @@ def check_consignment_compliance(case):
     2. No invoice at purchase-order level
     3. Separate consignment invoicing process
     """
-    activities = get_activity_names(case)
-    attributes = get_case_attributes(case)
-    violations = []
+    violations = pd.DataFrame(index=features.index)
     
     # Rule 1: Check for goods receipt
-    has_goods_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["goods_receipt"])
-    if not has_goods_receipt:
-        violations.append("Missing goods receipt activity")
+    violations[Reason.MISSING_GOODS_RECEIPT] = features['gr_count'] == 0
     
     # Rule 2: GR-based flag check
-    has_gr_flag = str(attributes.get("GR-based Inv. Verif.", "false")).lower() == "false"
-    if not has_gr_flag:
-        violations.append("GR-based invoice verification flag is not set to false")
+    violations[Reason.GR_BASED_FLAG_NOT_FALSE] = ~case_flag_matches(features, GR_BASED_FLAG, "false")
     
     # Rule 3: check goods receipt flag is true
-    has_gr_flag = str(attributes.get("Goods Receipt", "true")).lower() == "true"
-    if not has_gr_flag:
-        violations.append("Goods receipt flag is not set to true")
+    violations[Reason.GOODS_RECEIPT_FLAG_NOT_TRUE] = ~case_flag_matches(features, GOODS_RECEIPT_FLAG, "true")
 
     # Rule 4: No invoice at PO level (this is more complex to validate)
-    has_invoice_receipt = has_activity_pattern(activities, ACTIVITY_PATTERNS["invoice_receipt"])
-    if has_invoice_receipt:
-        violations.append("Invoice receipt activity found at purchase order level, which is not allowed for consignment")
+    violations[Reason.INVOICE_AT_PO_LEVEL] = features['invoice_count'] > 0
     
-    if violations:
-        return False, violations
-    return True, ["Compliant"]
+    return violations
+
+# Compliance checker of every item category
+COMPLIANCE_CHECKERS = {
+    '3_way_after': check_3way_after_compliance,
+    '3_way_before': check_3way_before_compliance,
+    '2_way': check_2way_compliance,
+    'consignment': check_consignment_compliance
+}
 
 # ---------------------------
 # MAIN COMPLIANCE FILTERING FUNCTION
 # ---------------------------
 
-def filter_compliance_by_category(log, category_name):
+def check_compliance(log, checker):
+    """Extract the case features of (part of) a log and apply a compliance checker to them"""
+    return checker(extract_case_features(log))
+
+def evaluate_compliance(log, checker, case_codes):
     """
-    Filter a log into compliant and non-compliant cases based on category
+    Compute the violations of all cases in a log, in parallel for large logs
+
+    Cases are independent, so the log is split into contiguous chunks of whole cases
+    which are checked by separate worker processes. Only the columns the case features
+    are computed from are sent to the workers.
+
+    Args:
+        log: Event DataFrame as returned by load_log
+        checker: One of the check_*_compliance functions
+        case_codes: Case number of every event, in order of first appearance of the case
+
+    Returns:
+        Violations DataFrame with one row per case, in the order of the case codes
+    """
+    total_cases = int(case_codes.max()) + 1 if len(case_codes) else 0
+    n_chunks = min(COMPLIANCE_WORKERS, total_cases // MIN_CASES_PER_WORKER)
+    if n_chunks <= 1:
+        return check_compliance(log, checker)
+    
+    logger.info(f"Checking {total_cases} cases in {n_chunks} worker processes")
+    chunk_ids = case_codes * n_chunks // total_cases
+    feature_columns = [column for column in [CASE_ID_KEY, ACTIVITY_KEY, CUMULATIVE_VALUE_KEY] + CASE_ATTRIBUTE_COLUMNS if column in log]
+    chunks = [log.loc[chunk_ids == chunk_id, feature_columns] for chunk_id in range(n_chunks)]
+    start_method = next(method for method in COMPLIANCE_START_METHODS if method in multiprocessing.get_all_start_methods())
+    with ProcessPoolExecutor(max_workers=n_chunks, mp_context=multiprocessing.get_context(start_method)) as executor:
+        return pd.concat(executor.map(check_compliance, chunks, repeat(checker, n_chunks)))
+
+def check_category_compliance(log, category_name):
+    """
+    Check the compliance of every case of a log based on category
     
     Args:
-        log: PM4Py event log
+        log: Event DataFrame as returned by load_log
         category_name: Category identifier (3_way_after, 3_way_before, 2_way, consignment)
     
     Returns:
-        Tuple of (compliant_log, non_compliant_log, compliance_stats)
+        Tuple of (is_compliant, compliance_stats). is_compliant is a boolean Series indexed
+        by case id in order of first appearance, or None when there is no checker for the
+        category.
     """
-    compliant_cases = []
-    non_compliant_cases = []
     compliance_stats = {
-        'total_cases': len(log),
+        'total_cases': 0,
         'compliant_cases': 0,
         'non_compliant_cases': 0,
         'compliance_reasons': Counter(),
@@ -521,52 +597,174 @@ def filter_compliance_by_category(log, category_name):
     }
     
     # Select appropriate compliance checker
-    compliance_checkers = {
-        '3_way_after': check_3way_after_compliance,
-        '3_way_before': check_3way_before_compliance,
-        '2_way': check_2way_compliance,
-        'consignment': check_consignment_compliance
-    }
-    
-    checker = compliance_checkers.get(category_name)
+    checker = COMPLIANCE_CHECKERS.get(category_name)
     if not checker:
         logger.error(f"No compliance checker found for category: {category_name}")
-        return log, EventLog(), compliance_stats
-    
-    logger.info(f"Checking compliance for category: {category_name}")
-    
-    # Process each case
-    for case in log:
-        is_compliant, reasons = checker(case)
-        
-        if is_compliant:
-            compliant_cases.append(case)
-            compliance_stats['compliant_cases'] += 1
-            for reason in reasons:
-                compliance_stats['compliance_reasons'][reason] += 1
-        else:
-            non_compliant_cases.append(case)
-            compliance_stats['non_compliant_cases'] += 1
-            for reason in reasons:
-                compliance_stats['non_compliance_reasons'][reason] += 1
-
-    # Create filtered logs
-    compliant_log = EventLog(compliant_cases, attributes=log.attributes, extensions=log.extensions)
-    non_compliant_log = EventLog(non_compliant_cases, attributes=log.attributes, extensions=log.extensions)
+        return None, compliance_stats
+    
+    # Evaluate all rules for all cases at once
+    case_codes, case_ids = pd.factorize(log[CASE_ID_KEY])
+    logger.info(f"Checking compliance of {len(case_ids)} cases for category: {category_name}")
+    violations = evaluate_compliance(log, checker, case_codes)
+    is_compliant = ~violations.any(axis=1)
+
+    compliance_stats['total_cases'] = len(violations)
+    compliance_stats['compliant_cases'] = int(is_compliant.sum())
+    compliance_stats['non_compliant_cases'] = compliance_stats['total_cases'] - compliance_stats['compliant_cases']
+    if compliance_stats['compliant_cases'] > 0:
+        compliance_stats['compliance_reasons']["Compliant"] = compliance_stats['compliant_cases']
+    for reason, count in violations.sum().items():
+        if count > 0:
+            compliance_stats['non_compliance_reasons'][Reason(reason)] = int(count)
     
     # Calculate compliance percentage
     if compliance_stats['total_cases'] > 0:
         compliance_rate = (compliance_stats['compliant_cases'] / compliance_stats['total_cases']) * 100
         logger.info(f"Category {category_name}: {compliance_rate:.2f}% compliant ({compliance_stats['compliant_cases']}/{compliance_stats['total_cases']})")
     
-    return compliant_log, non_compliant_log, compliance_stats
+    return is_compliant, compliance_stats
+
+def xes_header(source_path):
+    """
+    Return the start of an XES file up to its first trace (the opening log tag followed by
+    the extensions, globals, classifiers and log attributes), without parsing the traces
+    """
+    for _, elem in etree.iterparse(source_path, events=("start",)):
+        if elem.getparent() is None:
+            log_element = elem
+        elif etree.QName(elem).localname == "trace":
+            break
+    attributes = "".join(f" {key}={quoteattr(value)}" for key, value in log_element.attrib.items())
+    namespace = f" xmlns={quoteattr(log_element.nsmap[None])}" if None in log_element.nsmap else ""
+    header = f'<?xml version="1.0" encoding="UTF-8"?>\n<log{namespace}{attributes}>\n'.encode("utf-8")
+    # The elements before the first trace have been parsed completely by now
+    return header + b"".join(etree.tostring(child) for child in log_element if etree.QName(child).localname != "trace")
+
+def split_xes_file(source_path, compliant_case_ids, compliant_path, non_compliant_path):
+    """
+    Copy every trace of an XES file to the compliant or the non-compliant output file
+    
+    The source file is parsed incrementally and every trace is written out verbatim as
+    soon as it has been read, so no second in-memory copy of the log is needed for the
+    output. An output file is only created once its first trace is written, in a
+    directory that must already exist.
+    
+    Args:
+        source_path: Path to the XES file the compliance was checked on
+        compliant_case_ids: Set of the ids of the compliant cases
+        compliant_path: Output path for the compliant cases
+        non_compliant_path: Output path for the other cases
+    
+    Returns:
+        Tuple of (compliant_count, non_compliant_count)
+    """
+    if COMPRESS_OUTPUT:
+        compliant_path += ".gz"
+        non_compliant_path += ".gz"
+    outputs = {True: [compliant_path, None, 0], False: [non_compliant_path, None, 0]}
+    header = xes_header(source_path)
+    
+    try:
+        for _, trace in etree.iterparse(source_path, events=("end",), tag="{*}trace"):
+            case_id = next((child.get("value") for child in trace if child.get("key") == "concept:name"), None)
+            output = outputs[case_id in compliant_case_ids]
+            if output[1] is None:
+                output[1] = open_output(output[0])
+                output[1].write(header)
+            output[1].write(etree.tostring(trace))
+            output[2] += 1
+            
+            # Drop the trace and everything parsed before it
+            trace.clear()
+            while trace.getprevious() is not None:
+                del trace.getparent()[0]
+    finally:
+        for path, f, count in outputs.values():
+            if f is not None:
+                f.write(XES_LOG_CLOSING_TAG)
+                f.close()
+                logger.info(f"Saved {count} cases to {path}")
+    
+    return outputs[True][2], outputs[False][2]
+
+def write_xes_split(log, is_compliant, compliant_path, non_compliant_path):
+    """
+    Write the events of the compliant and of the non-compliant cases of an event DataFrame
+    as XES files with rustxes, an output file is only written when it has cases
+    
+    Args:
+        log: Event DataFrame the compliance was checked on
+        is_compliant: Boolean Series indexed by case id, as returned by check_category_compliance
+        compliant_path: Output path for the compliant cases
+        non_compliant_path: Output path for the other cases
+    
+    Returns:
+        Tuple of (compliant_count, non_compliant_count)
+    """
+    if COMPRESS_OUTPUT:
+        compliant_path += ".gz"
+        non_compliant_path += ".gz"
+    # rustxes would write the category codes instead of the activity names
+    log = log.astype({ACTIVITY_KEY: object})
+    in_compliant_case = log[CASE_ID_KEY].map(is_compliant).to_numpy(dtype=bool)
+    
+    counts = (int(is_compliant.sum()), int((~is_compliant).sum()))
+    for path, mask, count in ((compliant_path, in_compliant_case, counts[0]), (non_compliant_path, ~in_compliant_case, counts[1])):
+        if count > 0:
+            pm4py.write_xes(log[mask], path, case_id_key=CASE_ID_KEY)
+            logger.info(f"Saved {count} cases to {path}")
+    
+    return counts
+
+def process_xes_file(xes_file):
+    """
+    Check the compliance of one XES file of the input directory and write its compliant
+    and non-compliant cases
+    
+    Returns:
+        Tuple of (category_name, compliance_stats), or None if the file could not be checked
+    """
+    # Determine category from filename
+    category_name = category_from_filename(xes_file)
+    
+    if not category_name:
+        logger.warning(f"Could not determine category for file: {xes_file}")
+        return None
+    
+    # Load the log
+    log_path = os.path.join(INPUT_DIR, xes_file)
+    try:
+        log = load_log(log_path)
+    except Exception as e:
+        logger.error(f"Failed to load {xes_file}: {str(e)}")
+        return None
+    
+    # Check compliance and write the compliant and non-compliant cases
+    stats = None
+    try:
+        is_compliant, stats = check_category_compliance(log, category_name)
+        if is_compliant is not None:
+            compliant_path = os.path.join(COMPLIANT_DIR, f"compliant_{xes_file}")
+            non_compliant_path = os.path.join(NON_COMPLIANT_DIR, f"non_compliant_{xes_file}")
+            if STREAM_XES_OUTPUT or XES_IMPORT_VARIANT != "rustxes":
+                # Stream the compliant and non-compliant cases from the source file to their outputs
+                del log
+                split_xes_file(log_path, set(is_compliant.index[is_compliant]), compliant_path, non_compliant_path)
+            else:
+                write_xes_split(log, is_compliant, compliant_path, non_compliant_path)
+            
+    except Exception as e:
+        logger.error(f"Error processing {xes_file}: {str(e)}")
+        traceback.print_exc()
+    
+    return (category_name, stats) if stats is not None else None
 
 def process_all_categories():
     """Process all item categories for compliance filtering"""
     
-    # Create output directories
-    os.makedirs(COMPLIANT_DIR, exist_ok=True)
-    os.makedirs(NON_COMPLIANT_DIR, exist_ok=True)
+    # Create output directories once, the per-file steps expect them to exist
+    for directory in (COMPLIANT_DIR, NON_COMPLIANT_DIR, STATS_DIR):
+        os.makedirs(directory, exist_ok=True)
     
     # Find all XES files in the filtered data folder
     xes_files = [f for f in os.listdir(INPUT_DIR) if f.endswith('.xes')]
@@ -577,60 +775,16 @@ def process_all_categories():
     
     logger.info(f"Found {len(xes_files)} XES files: {xes_files}")
     
-    overall_stats = {}
-    
-    for xes_file in xes_files:
-        # Determine category from filename
-        category_name = None
-        for cat in ITEM_CATEGORIES.keys():
-            if cat in xes_file.lower() or xes_file.lower().startswith(f"group_{cat}"):
-                category_name = cat
-                break
-        
-        if not category_name:
-            logger.warning(f"Could not determine category for file: {xes_file}")
-            continue
-        
-        # Load the log
-        log_path = os.path.join(INPUT_DIR, xes_file)
-        try:
-            log = load_log(log_path)
-        except Exception as e:
-            logger.error(f"Failed to load {xes_file}: {str(e)}")
-            continue
-        
-        # Filter for compliance
-        try:
-            compliant_log, non_compliant_log, stats = filter_compliance_by_category(log, category_name)
-            overall_stats[category_name] = stats
-            
-            # Save compliant cases
-            if len(compliant_log) > 0:
-                compliant_filename = f"compliant_{xes_file}"
-                compliant_path = os.path.join(COMPLIANT_DIR, compliant_filename)
-                save_log(compliant_log, compliant_path)
-            
-            # Save non-compliant cases
-            if len(non_compliant_log) > 0:
-                non_compliant_filename = f"non_compliant_{xes_file}"
-                non_compliant_path = os.path.join(NON_COMPLIANT_DIR, non_compliant_filename)
-                save_log(non_compliant_log, non_compliant_path)
-                
-        except Exception as e:
-            logger.error(f"Error processing {xes_file}: {str(e)}")
-            traceback.print_exc()
-            continue
+    # Files are independent, process them concurrently (results keep the order of the files)
+    with ThreadPoolExecutor(max_workers=min(FILE_WORKERS, len(xes_files))) as executor:
+        results = list(executor.map(process_xes_file, xes_files))
+    overall_stats = dict(result for result in results if result is not None)
     
     # Print overall statistics
     print("\n" + "="*60)
     print("COMPLIANCE FILTERING SUMMARY")
     print("="*60)
     
-    # Create a directory for statistics
-    STATS_DIR = os.path.join(OUTPUT_DIR, 'stats')
-    os.makedirs(STATS_DIR, exist_ok=True)
-    
-    
     for category, stats in overall_stats.items():
         total = stats['total_cases']
         compliant = stats['compliant_cases']
@@ -645,14 +799,14 @@ def process_all_categories():
         if stats['non_compliance_reasons']:
             print("  Top non-compliance reasons:")
             for reason, count in stats['non_compliance_reasons'].most_common(3):
-                print(f"    - {reason}: {count} cases")
+                print(f"    - {REASON_MESSAGES[reason]}: {count} cases")
         
         # Save non-compliance reasons to JSON
         non_compliance_data = {
             'category': category,
             'total_cases': total,
             'non_compliant_cases': non_compliant,
-            'reasons': dict(stats['non_compliance_reasons'])
+            'reasons': {REASON_MESSAGES[reason]: count for reason, count in stats['non_compliance_reasons'].items()}
         }
         
         # Save to JSON file
@@ -7,84 +7,129 @@ rather than between specific users.
 """
 
 import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import networkx as nx
+import matplotlib
+matplotlib.use('Agg')  # Only files are written, no GUI backend needed
 import matplotlib.pyplot as plt
 from xml.etree import ElementTree as ET
-from collections import defaultdict
+from graph_layout import lbfgs_spring_layout, cached_layout
+
+# The XES import helpers shared by the scripts are in analyze_logs.py in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_logs import XES_IMPORT_VARIANT, load_event_log, cached_log_path
 
 # Input/Output settings
 INPUT_DIR = './data/filtered'
 OUTPUT_DIR = './data/analysis/visualizations'
 
+# Resolution of the saved plots, 150 dpi for drafts (set PLOT_DPI=300 for publication quality)
+PLOT_DPI = int(os.environ.get('PLOT_DPI', 150))
+
+# Keep a parquet copy of every parsed XES log next to it (shared with the compliance
+# filter and the transition analysis), later runs read that instead of the XES file
+# as long as the XES file has not changed since
+CACHE_PARSED_LOGS = True
+
+# Event DataFrame columns
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_KEY = 'concept:name'
+
+# Number of XES files parsed in parallel (parsing is CPU-bound Python, so in separate processes)
+FILE_WORKERS = os.cpu_count() or 1
+
 def extract_activity_handovers(xes_file):
-    """Extract handovers between activities from XES file."""
-    tree = ET.parse(xes_file)
-    root = tree.getroot()
-    
-    # Remove namespace for easier parsing
-    for elem in root.iter():
-        if '}' in elem.tag:
-            elem.tag = elem.tag.split('}', 1)[1]
-    
-    handovers = defaultdict(int)
-    
-    # Process each trace
-    for trace in root.findall('.//trace'):
-        events = []
-        for event in trace.findall('event'):
-            activity = event.find("./string[@key='concept:name']").get('value')
-            events.append(activity)
+    """Count the handovers between activities in an XES file, as a Counter of (from, to) activity pairs."""
+    # Read the log as event DataFrame when that is fast (cached or with rustxes), otherwise stream it
+    if (CACHE_PARSED_LOGS and cached_log_path(xes_file)) or XES_IMPORT_VARIANT == "rustxes":
+        events = load_event_log(xes_file, columns=[CASE_ID_KEY, ACTIVITY_KEY], use_cache=CACHE_PARSED_LOGS)
+        case_ids = events[CASE_ID_KEY].to_numpy()
+        activities = events[ACTIVITY_KEY].to_numpy(dtype=object)
+        # Consecutive events of the same case form a handover, count each (from, to) pair in one groupby
+        same_case = case_ids[:-1] == case_ids[1:]
+        pairs = pd.DataFrame({'from': activities[:-1][same_case], 'to': activities[1:][same_case]})
+        return Counter(pairs.groupby(['from', 'to'], sort=False).size().to_dict())
+    
+    handovers = Counter()
+    
+    # Stream the file so only one trace is held in memory at a time
+    context = ET.iterparse(xes_file, events=('start', 'end'))
+    _, root = next(context)
+    
+    # Match tags on the namespace of the log element instead of rewriting every tag
+    namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+    trace_tag = namespace + 'trace'
+    event_tag = namespace + 'event'
+    activity_path = f"{namespace}string[@key='concept:name']"
+    
+    for ev, elem in context:
+        if ev != 'end' or elem.tag != trace_tag:
+            continue
+        
+        events = [event.find(activity_path).get('value') for event in elem.iterfind(event_tag)]
         
         # Record handovers in this trace
-        for i in range(len(events)-1):
-            handover = (events[i], events[i+1])
-            handovers[handover] += 1
+        handovers.update(zip(events[:-1], events[1:]))
+        
+        # Drop the processed trace
+        elem.clear()
+        root.remove(elem)
     
     return handovers
 
 def create_handover_df():
     """Create DataFrame of handovers between activities."""
-    all_handovers = defaultdict(int)
+    all_handovers = Counter()
     
-    # Process each XES file
-    for file in os.listdir(INPUT_DIR):
-        if file.endswith('.xes'):
-            file_path = os.path.join(INPUT_DIR, file)
+    # Process the XES files in parallel, collecting the results in file order
+    xes_files = [file for file in os.listdir(INPUT_DIR) if file.endswith('.xes')]
+    with ProcessPoolExecutor(max_workers=max(1, min(FILE_WORKERS, len(xes_files)))) as executor:
+        futures = [executor.submit(extract_activity_handovers, os.path.join(INPUT_DIR, file)) for file in xes_files]
+        for file, future in zip(xes_files, futures):
             print(f"\nProcessing {file}...")
             try:
-                trace_handovers = extract_activity_handovers(file_path)
-                for handover, count in trace_handovers.items():
-                    all_handovers[handover] += count
+                # Only the pair counts of each file are sent back by the workers
+                all_handovers.update(future.result())
             except Exception as e:
                 print(f"Error processing {file}: {str(e)}")
     
     # Convert to DataFrame
-    handover_data = []
-    for (from_activity, to_activity), count in all_handovers.items():
-        handover_data.append({
-            'from_role': from_activity,
-            'to_role': to_activity,
-            'count': count
-        })
-    
-    df = pd.DataFrame(handover_data)
+    df = pd.DataFrame(
+        [(from_activity, to_activity, count) for (from_activity, to_activity), count in all_handovers.items()],
+        columns=['from_role', 'to_role', 'count']
+    )
     df['percentage'] = df['count'] / df['count'].sum() * 100
     return df.sort_values('count', ascending=False)
 
-def create_ego_network(handover_metrics, central_activity, n_neighbors=5):
-    """Create ego network visualization centered on specified activity."""
+def index_handovers_by_activity(handover_metrics):
+    """Map each activity to the positions of the handovers it starts or ends."""
+    by_from = handover_metrics.groupby('from_role', sort=False).indices
+    by_to = handover_metrics.groupby('to_role', sort=False).indices
+    no_rows = np.array([], dtype=np.intp)
+    return {
+        activity: np.union1d(by_from.get(activity, no_rows), by_to.get(activity, no_rows))
+        for activity in by_from.keys() | by_to.keys()
+    }
+
+def create_ego_network(handover_metrics, central_activity, n_neighbors=5, activity_rows=None):
+    """
+    Create ego network visualization centered on specified activity.
+    
+    activity_rows is the result of index_handovers_by_activity, pass it when creating
+    several ego networks from the same handovers so the table is only scanned once.
+    """
     print(f"\nCreating ego network for activity: {central_activity}")
     
-    # Create directed graph
-    G = nx.DiGraph()
+    if activity_rows is None:
+        activity_rows = index_handovers_by_activity(handover_metrics)
     
     # Filter handovers involving central activity
-    ego_handovers = handover_metrics[
-        (handover_metrics['from_role'] == central_activity) |
-        (handover_metrics['to_role'] == central_activity)
-    ].nlargest(n_neighbors, 'count')
+    ego_rows = activity_rows.get(central_activity, np.array([], dtype=np.intp))
+    ego_handovers = handover_metrics.iloc[ego_rows].nlargest(n_neighbors, 'count')
     
     print(f"\nFound {len(ego_handovers)} handovers:")
     print(ego_handovers)
@@ -93,33 +138,34 @@ def create_ego_network(handover_metrics, central_activity, n_neighbors=5):
         print(f"No handovers found for {central_activity}")
         return
     
-    # Add edges with weights
+    # Create directed graph with weighted edges
     max_count = ego_handovers['count'].max()
-    for _, row in ego_handovers.iterrows():
-        G.add_edge(
-            row['from_role'],
-            row['to_role'],
-            weight=row['count'],
-            width=3 * row['count'] / max_count,
-            count=row['count']
-        )
+    edges = ego_handovers.assign(
+        weight=ego_handovers['count'],
+        width=3 * ego_handovers['count'] / max_count
+    )
+    G = nx.from_pandas_edgelist(
+        edges, 'from_role', 'to_role',
+        edge_attr=['weight', 'width', 'count'],
+        create_using=nx.DiGraph
+    )
     
     # Create layout
-    pos = nx.spring_layout(G, k=1, seed=42)
+    pos = cached_layout(G, lbfgs_spring_layout, k=1, seed=42)
     
     # Create figure with a specific size and add subplot
     fig, ax = plt.subplots(figsize=(15, 10))
     
     # Draw edges with varying thickness and color based on frequency
-    edges = G.edges(data=True)
-    edge_colors = [plt.cm.YlOrRd(data['count']/max_count) for _, _, data in edges]
-    edge_widths = [data['width'] for _, _, data in edges]
+    counts = np.fromiter((count for _, _, count in G.edges(data='count')), dtype=np.float64, count=G.number_of_edges())
+    edge_colors = plt.cm.YlOrRd(counts / max_count)
+    edge_widths = 3 * counts / max_count
     
     # Draw the network
     nx.draw_networkx_edges(G, pos, edge_color=edge_colors, width=edge_widths, alpha=0.7, ax=ax)
     
     # Draw nodes
-    node_colors = ['lightcoral' if node == central_activity else 'lightblue' for node in G.nodes()]
+    node_colors = np.where(np.array(list(G.nodes()), dtype=object) == central_activity, 'lightcoral', 'lightblue')
     nx.draw_networkx_nodes(G, pos, node_size=2000, node_color=node_colors, alpha=0.7, ax=ax)
     
     # Draw labels with smaller font and word wrapping
@@ -143,7 +189,7 @@ def create_ego_network(handover_metrics, central_activity, n_neighbors=5):
     # Save visualization
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     output_path = os.path.join(OUTPUT_DIR, f'activity_network_{central_activity.lower().replace(" ", "_")}.png')
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    plt.savefig(output_path, dpi=PLOT_DPI, bbox_inches='tight')
     print(f"\nSaved visualization to: {output_path}")
     plt.close()
 
@@ -163,8 +209,9 @@ def main():
         'Clear Invoice'
     ]
     
+    activity_rows = index_handovers_by_activity(handover_metrics)
     for activity in key_activities:
-        create_ego_network(handover_metrics, activity)
+        create_ego_network(handover_metrics, activity, activity_rows=activity_rows)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
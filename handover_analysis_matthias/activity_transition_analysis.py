@@ -8,14 +8,23 @@ to record activity-to-activity handovers and their frequencies.
 """
 
 import os
+import sys
 import logging
-from collections import Counter, defaultdict
+from functools import lru_cache
+from collections import Counter
 import pandas as pd
 import numpy as np
 import seaborn as sns
+import matplotlib
+matplotlib.use('Agg')  # Only files are written, no GUI backend needed
 import matplotlib.pyplot as plt
-from pm4py.objects.log.importer.xes import importer as xes_importer
+from matplotlib.collections import LineCollection
 import networkx as nx
+from graph_layout import lbfgs_spring_layout, cached_layout
+
+# The XES import helpers shared by the scripts are in analyze_logs.py in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_logs import load_event_log
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +37,18 @@ logger = logging.getLogger(__name__)
 INPUT_DIR = './data/filtered'
 OUTPUT_DIR = './data/analysis/activity_transitions'
 
+# Resolution of the saved plots, 150 dpi for drafts (set PLOT_DPI=300 for publication quality)
+PLOT_DPI = int(os.environ.get('PLOT_DPI', 150))
+
+# Keep a parquet copy of every parsed XES log next to it, later runs read that instead
+# of parsing the XES again (as long as the XES file has not changed since)
+CACHE_PARSED_LOGS = True
+
+# Event DataFrame columns
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_KEY = 'concept:name'
+RESOURCE_KEY = 'org:resource'
+
 # Process categories
 ITEM_CATEGORIES = {
     # '3_way_after': 'Record Invoice Receipt (After GR)',
@@ -36,8 +57,9 @@ ITEM_CATEGORIES = {
     'consignment': 'Consignment'
 }
 
+@lru_cache(maxsize=None)
 def get_role(resource):
-    """Extract role from resource identifier."""
+    """Extract role from resource identifier (cached, as logs hold few distinct resources)."""
     if resource == "NONE" or not resource:
         return "NONE"
     if resource.startswith("batch"):
@@ -50,81 +72,130 @@ def get_role(resource):
             return "UNKNOWN"
     return resource
 
+def load_log(log_file_path):
+    """Load an XES log file as an event DataFrame, using the parquet cache when it is up to date"""
+    return load_event_log(log_file_path, use_cache=CACHE_PARSED_LOGS)
+
 def analyze_activity_transitions(log, category_name):
     """
     Analyze activity transitions where handovers occur.
     
     Args:
-        log: PM4Py event log
+        log: Event DataFrame with the events of each case in consecutive rows
         category_name: Name of the process category
         
     Returns:
-        DataFrame containing transition information and handover details
+        DataFrame containing transition information, and the handover details as a dict with
+        the sorted 'activities' and 'roles', and the handover counts per pair of them in
+        'activity_matrix' and 'role_matrix' (indexed [from, to])
     """
     logger.info(f"Analyzing activity transitions for {category_name}")
     
-    # Store transitions and handovers
-    transitions = []
-    handover_details = defaultdict(lambda: {'total': 0, 'roles': defaultdict(int)})
+    # A transition starts at every event that is followed by an event of the same case
+    case_ids = log[CASE_ID_KEY].to_numpy()
+    from_idx = np.flatnonzero(case_ids[:-1] == case_ids[1:])
+    to_idx = from_idx + 1
     
-    for case_idx, case in enumerate(log):
-        if case_idx % 1000 == 0:
-            logger.info(f"Processing case {case_idx} of {len(log)}")
-        
-        events = list(case)
-        for i in range(len(events) - 1):
-            current_event = events[i]
-            next_event = events[i + 1]
-            
-            # Get activities and roles
-            current_activity = current_event["concept:name"]
-            next_activity = next_event["concept:name"]
-            current_role = get_role(current_event.get("org:resource", "NONE"))
-            next_role = get_role(next_event.get("org:resource", "NONE"))
-            
-            # Record transition
-            transition = {
-                'from_activity': current_activity,
-                'to_activity': next_activity,
-                'from_role': current_role,
-                'to_role': next_role,
-                'is_handover': current_role != next_role
-            }
-            transitions.append(transition)
-            
-            # If it's a handover, record detailed information
-            if current_role != next_role:
-                key = f"{current_activity} → {next_activity}"
-                role_key = f"{current_role} → {next_role}"
-                handover_details[key]['total'] += 1
-                handover_details[key]['roles'][role_key] += 1
+    if len(from_idx) == 0:
+        logger.warning(f"No transitions found for {category_name}")
+        return pd.DataFrame(), pd.DataFrame(), {}
     
-    # Convert to DataFrame
-    df = pd.DataFrame(transitions)
+    # Encode activities and roles as integer codes over sorted dictionaries, so pairs can be
+    # counted with bincount and come out in sorted order. Roles are derived once per distinct resource.
+    activity_codes, activity_categories = pd.factorize(log[ACTIVITY_KEY].to_numpy(dtype=object), sort=True)
+    if RESOURCE_KEY in log.columns:
+        resource_codes, unique_resources = pd.factorize(log[RESOURCE_KEY])
+    else:
+        resource_codes, unique_resources = np.full(len(log), -1), []
+    # Events without a resource (code -1) pick the trailing "NONE" role
+    resource_roles = np.array([get_role(resource) for resource in unique_resources] + ["NONE"], dtype=object)
+    role_codes, role_categories = pd.factorize(resource_roles[resource_codes], sort=True)
+    n_activities = len(activity_categories)
+    n_roles = len(role_categories)
     
-    if len(df) == 0:
-        logger.warning(f"No transitions found for {category_name}")
-        return pd.DataFrame(), pd.DataFrame(), handover_details
+    # Code each transition as a single (from, to) activity pair index
+    pair_codes = activity_codes[from_idx].astype(np.int64) * n_activities + activity_codes[to_idx]
+    from_roles = role_codes[from_idx]
+    to_roles = role_codes[to_idx]
+    is_handover = from_roles != to_roles
     
-    # Calculate frequencies and percentages
-    total_transitions = len(df)
-    transition_counts = df.groupby(['from_activity', 'to_activity']).size().reset_index(name='frequency')
-    transition_counts['percentage'] = (transition_counts['frequency'] / total_transitions * 100).round(2)
+    # Calculate frequencies and percentages of the observed pairs
+    total_transitions = len(pair_codes)
+    total_handovers = int(is_handover.sum())
+    frequencies = np.bincount(pair_codes, minlength=n_activities * n_activities)
+    handover_frequencies = np.bincount(pair_codes[is_handover], minlength=n_activities * n_activities)
+    observed_pairs = np.flatnonzero(frequencies)
     
-    # Calculate handover frequencies
-    handover_counts = df[df['is_handover']].groupby(['from_activity', 'to_activity']).size().reset_index(name='handover_frequency')
-    handover_counts['handover_percentage'] = (handover_counts['handover_frequency'] / len(df[df['is_handover']]) * 100).round(2)
+    # Handover counts per (from, to) activity pair and per (from, to) role pair
+    handover_details = {
+        'activities': activity_categories,
+        'roles': role_categories,
+        'activity_matrix': handover_frequencies.reshape(n_activities, n_activities),
+        'role_matrix': np.bincount(
+            from_roles[is_handover].astype(np.int64) * n_roles + to_roles[is_handover],
+            minlength=n_roles * n_roles
+        ).reshape(n_roles, n_roles)
+    }
+    from_activities, to_activities = np.divmod(observed_pairs, n_activities)
     
-    # Merge handover information
-    transition_counts = transition_counts.merge(handover_counts, on=['from_activity', 'to_activity'], how='left')
-    transition_counts['handover_frequency'] = transition_counts['handover_frequency'].fillna(0)
-    transition_counts['handover_percentage'] = transition_counts['handover_percentage'].fillna(0)
+    transition_counts = pd.DataFrame({
+        'from_activity': activity_categories[from_activities],
+        'to_activity': activity_categories[to_activities],
+        'frequency': frequencies[observed_pairs]
+    })
+    transition_counts['percentage'] = (transition_counts['frequency'] / total_transitions * 100).round(2)
+    transition_counts['handover_frequency'] = handover_frequencies[observed_pairs]
+    transition_counts['handover_percentage'] = (
+        (transition_counts['handover_frequency'] / total_handovers * 100).round(2) if total_handovers else 0.0
+    )
     
     # Sort by handover frequency
     transition_counts = transition_counts.sort_values('handover_frequency', ascending=False)
     
     return transition_counts, handover_details
 
+def draw_curved_edges(ax, G, pos, widths, color='gray', alpha=0.6, rad=0.2, arrow_position=0.75, samples=30):
+    """
+    Draw the edges of G as arcs with arrowheads using one LineCollection and one quiver,
+    instead of a separate arrow patch per edge.
+    
+    Arcs bend like matplotlib's 'arc3' connection style with the given rad, self-loops are
+    drawn as small circles above their node. Arrowheads sit at arrow_position along each edge.
+    """
+    edges = list(G.edges())
+    if not edges:
+        return
+    
+    coords = np.array(list(pos.values()))
+    loop_radius = 0.04 * max(np.ptp(coords, axis=0).max(), 1e-9)
+    sources = np.array([pos[u] for u, _ in edges], dtype=float)
+    targets = np.array([pos[v] for _, v in edges], dtype=float)
+    t = np.linspace(0, 1, samples)[None, :, None]
+    
+    # Quadratic Bezier curves through the 'arc3' control point of every edge
+    delta = targets - sources
+    control = (sources + targets) / 2 + rad * np.column_stack([delta[:, 1], -delta[:, 0]])
+    curves = ((1 - t) ** 2 * sources[:, None] + 2 * (1 - t) * t * control[:, None] + t ** 2 * targets[:, None])
+    a = arrow_position
+    heads = (1 - a) ** 2 * sources + 2 * (1 - a) * a * control + a ** 2 * targets
+    directions = 2 * (1 - a) * (control - sources) + 2 * a * (targets - control)
+    
+    # Self-loops: circles touching their node from above
+    loops = np.flatnonzero((delta == 0).all(axis=1))
+    if len(loops):
+        angles = -np.pi / 2 + 2 * np.pi * t[..., 0]
+        centers = sources[loops] + [0, loop_radius]
+        curves[loops] = centers[:, None] + loop_radius * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+        head_angle = -np.pi / 2 + 2 * np.pi * a
+        heads[loops] = centers + loop_radius * np.array([np.cos(head_angle), np.sin(head_angle)])
+        directions[loops] = [-np.sin(head_angle), np.cos(head_angle)]
+    
+    ax.add_collection(LineCollection(curves, linewidths=widths, colors=color, alpha=alpha))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    # Unit directions scaled to just over the head length, so only the arrowheads show
+    ax.quiver(heads[:, 0], heads[:, 1], directions[:, 0], directions[:, 1], pivot='mid', angles='xy', scale_units='width', scale=45,
+              color=color, alpha=alpha, width=0.002, headwidth=8, headlength=10, headaxislength=9)
+
 def create_visualizations(transition_counts, handover_details, category_name):
     """Create visualizations for activity transitions analysis."""
     logger.info(f"Creating visualizations for {category_name}")
@@ -159,67 +230,47 @@ def create_visualizations(transition_counts, handover_details, category_name):
     # Only show the top 20 most frequent handover transitions
     top_n = 20
     top_transitions = transition_counts.sort_values('handover_frequency', ascending=False).head(top_n)
-    G = nx.DiGraph()
     
-    # Add nodes and edges for top transitions only
-    for _, row in top_transitions.iterrows():
-        from_activity = row['from_activity']
-        to_activity = row['to_activity']
-        handover_freq = row['handover_frequency']
-        
-        if from_activity not in G:
-            G.add_node(from_activity)
-        if to_activity not in G:
-            G.add_node(to_activity)
-        if handover_freq > 0:
-            G.add_edge(from_activity, to_activity, weight=handover_freq)
+    # Add nodes for top transitions only (in order of appearance), and edges for those with handovers
+    G = nx.DiGraph()
+    G.add_nodes_from(pd.unique(top_transitions[['from_activity', 'to_activity']].to_numpy().ravel()))
+    handover_edges = top_transitions[top_transitions['handover_frequency'] > 0]
+    G.add_edges_from(nx.from_pandas_edgelist(
+        handover_edges.rename(columns={'handover_frequency': 'weight'}), 'from_activity', 'to_activity',
+        edge_attr='weight', create_using=nx.DiGraph
+    ).edges(data=True))
     
     # Create visualization
-    plt.figure(figsize=(20, 15))
+    fig, ax = plt.subplots(figsize=(20, 15))
     if category_name == 'consignment':
-        pos = nx.spring_layout(G, k=20, scale=5)
+        pos = cached_layout(G, lbfgs_spring_layout, k=20, scale=5)
     else:
-        pos = nx.kamada_kawai_layout(G, scale=2)
-    nx.draw_networkx_nodes(G, pos, node_color='lightblue', node_size=10000, alpha=0.7)
-    edge_weights = [G[u][v]['weight'] for u, v in G.edges()]
-    max_weight = max(edge_weights) if edge_weights else 1
-    edge_widths = [1 + 4 * (w / max_weight) for w in edge_weights]
-    nx.draw_networkx_edges(G, pos, width=edge_widths, edge_color='gray', arrows=True, arrowsize=20, connectionstyle='arc3,rad=0.2', alpha=0.6)
+        pos = cached_layout(G, nx.kamada_kawai_layout, scale=2)
+    nx.draw_networkx_nodes(G, pos, node_color='lightblue', node_size=10000, alpha=0.7, ax=ax)
+    edge_weights = np.fromiter((w for _, _, w in G.edges(data='weight')), dtype=float, count=G.number_of_edges())
+    max_weight = edge_weights.max() if len(edge_weights) else 1
+    edge_widths = 1 + 4 * (edge_weights / max_weight)
+    draw_curved_edges(ax, G, pos, edge_widths)
     labels = {node: node.replace(' ', '\n') for node in G.nodes()}
-    nx.draw_networkx_labels(G, pos, labels=labels, font_size=13, font_weight='bold', bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=3))
+    nx.draw_networkx_labels(G, pos, labels=labels, font_size=13, font_weight='bold', bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=3), ax=ax)
     plt.title(f'Activity Transition Network ({category_name})\nTop 20 handover transitions', pad=20, fontsize=12)
     plt.axis('off')
     edge_legend = plt.Line2D([0], [0], color='gray', linewidth=1 + 4 * (max_weight/max_weight), label=f'Max handovers: {max_weight:.0f}')
     plt.legend(handles=[edge_legend], loc='upper right', bbox_to_anchor=(1.1, 1.1))
     plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_transition_network.png'), dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_transition_network.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
     
     # 3. Create heatmap of role transitions
-    role_transitions = defaultdict(int)
-    for key, details in handover_details.items():
-        for role_key, count in details['roles'].items():
-            role_transitions[role_key] += count
+    role_matrix = handover_details['role_matrix']
+    roles = handover_details['roles']
     
-    # Convert to DataFrame for heatmap
-    role_pairs = [pair.split(' → ') for pair in role_transitions.keys()]
-    from_roles = [pair[0] for pair in role_pairs]
-    to_roles = [pair[1] for pair in role_pairs]
-    counts = list(role_transitions.values())
-    
-    role_df = pd.DataFrame({
-        'from_role': from_roles,
-        'to_role': to_roles,
-        'count': counts
-    })
-    
-    # Create pivot table for heatmap
-    heatmap_data = role_df.pivot_table(
-        values='count',
-        index='from_role',
-        columns='to_role',
-        fill_value=0
-    )
+    # Only show the roles that hand over or receive work
+    from_mask = role_matrix.any(axis=1)
+    to_mask = role_matrix.any(axis=0)
+    heatmap_data = pd.DataFrame(role_matrix[from_mask][:, to_mask], index=roles[from_mask], columns=roles[to_mask])
+    heatmap_data.index.name = 'from_role'
+    heatmap_data.columns.name = 'to_role'
     
     plt.figure(figsize=(12, 8))
     sns.heatmap(heatmap_data, annot=True, fmt='.0f', cmap='YlOrRd')
@@ -252,8 +303,8 @@ def main():
         try:
             # Load and analyze the log
             logger.info(f"Loading log file: {xes_file}")
-            log = xes_importer.apply(xes_file)
-            logger.info(f"Successfully loaded log with {len(log)} cases")
+            log = load_log(xes_file)
+            logger.info(f"Successfully loaded log with {len(log)} events")
             
             # Analyze activity transitions
             transition_counts, handover_details = analyze_activity_transitions(log, category_name)
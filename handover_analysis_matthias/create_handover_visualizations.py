@@ -1,4 +1,6 @@
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Only files are written, no GUI backend needed
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
@@ -8,6 +10,9 @@ import os
 OUTPUT_DIR = 'handover_analysis_matthias/output/visualizations'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Resolution of the saved plots, 150 dpi for drafts (set PLOT_DPI=300 for publication quality)
+PLOT_DPI = int(os.environ.get('PLOT_DPI', 150))
+
 # Set style for scientific publication
 plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams['figure.figsize'] = [12, 8]
@@ -23,6 +28,9 @@ COLOR_PALETTE = [PRIMARY_COLOR, SECONDARY_COLOR] + sns.color_palette("Blues_r",
 # Read the data
 handovers_df = pd.read_csv('handover_analysis_matthias/data/analysis/handovers/handovers_all_categories.csv')
 
+# Split the handovers by category once (in order of appearance), for the per-category plots
+CATEGORY_FRAMES = dict(list(handovers_df.groupby('category', sort=False)))
+
 # Read all keypoints data
 keypoints_data = {}
 for category in ['3_way_after', '3_way_before', '2_way', 'consignment']:
@@ -34,46 +42,43 @@ for category in ['3_way_after', '3_way_before', '2_way', 'consignment']:
 
 # 1. Top Handover Pairs Across Categories
 def create_top_handovers_plot():
-    plt.figure(figsize=(15, 8))
+    fig, ax = plt.subplots(figsize=(15, 8))
     
     # Get top 5 handovers for each category
-    top_handovers = []
-    for category in handovers_df['category'].unique():
-        category_data = handovers_df[handovers_df['category'] == category].head(5)
-        top_handovers.append(category_data)
-    
-    top_handovers_df = pd.concat(top_handovers)
+    top_handovers_df = pd.concat([category_data.head(5) for category_data in CATEGORY_FRAMES.values()])
     
     # Create the plot with custom colors
     sns.barplot(data=top_handovers_df, 
                 x='percentage', 
                 y='category',
                 hue='from_role',
-                palette=COLOR_PALETTE)
+                palette=COLOR_PALETTE,
+                ax=ax)
     
-    plt.title('Top Handover Pairs by Process Category')
-    plt.xlabel('Percentage of Total Handovers')
-    plt.ylabel('Process Category')
-    plt.legend(title='From Role', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'handover_pairs_by_category.png'), dpi=300, bbox_inches='tight')
-    plt.close()
+    ax.set_title('Top Handover Pairs by Process Category')
+    ax.set_xlabel('Percentage of Total Handovers')
+    ax.set_ylabel('Process Category')
+    ax.legend(title='From Role', bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    fig.savefig(os.path.join(OUTPUT_DIR, 'handover_pairs_by_category.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
 
 # New function: Detailed bar plots for frequent pairs
 def create_frequent_pairs_barplots():
-    # Create subplots for each category
-    for category in handovers_df['category'].unique():
-        plt.figure(figsize=(15, 10))
+    # Draw the plot of every category on the same figure, cleared in between
+    fig, ax = plt.subplots(figsize=(15, 10))
+    for category, category_data in CATEGORY_FRAMES.items():
+        ax.clear()
         
         # Get top 10 handovers for this category
-        category_data = handovers_df[handovers_df['category'] == category].head(10)
+        category_data = category_data.head(10)
         
         # Create pair labels
         pair_labels = [f"{row['from_role']}\n→\n{row['to_role']}" 
                       for _, row in category_data.iterrows()]
         
         # Create bars using count instead of percentage
-        bars = plt.bar(range(len(pair_labels)), 
+        bars = ax.bar(range(len(pair_labels)), 
                       category_data['count'],
                       color=PRIMARY_COLOR)
         
@@ -81,31 +86,34 @@ def create_frequent_pairs_barplots():
         for bar in bars:
             height = bar.get_height()
             percentage = (height / category_data['count'].sum()) * 100
-            plt.text(bar.get_x() + bar.get_width()/2., height,
+            ax.text(bar.get_x() + bar.get_width()/2., height,
                     f'Count: {int(height)}\n({percentage:.1f}%)',
                     ha='center', va='bottom')
         
         # Customize plot
         category_name = category.replace('_', ' ').title()
-        plt.title(f'Top 10 Most Frequent Handover Pairs\n{category_name} Process')
-        plt.xlabel('Role Pairs')
-        plt.ylabel('Number of Handovers')
-        plt.xticks(range(len(pair_labels)), pair_labels, rotation=45, ha='right')
+        ax.set_title(f'Top 10 Most Frequent Handover Pairs\n{category_name} Process')
+        ax.set_xlabel('Role Pairs')
+        ax.set_ylabel('Number of Handovers')
+        ax.set_xticks(range(len(pair_labels)))
+        ax.set_xticklabels(pair_labels, rotation=45, ha='right')
         
         # Add grid for better readability
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
         
         # Format y-axis with comma separator for thousands
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: format(int(x), ',')))
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, f'frequent_pairs_barplot_{category}.png'), dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(os.path.join(OUTPUT_DIR, f'frequent_pairs_barplot_{category}.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
 
 # 2. Critical Handover Points Visualization for all variants
 def create_keypoints_visualization():
+    # Draw the plot of every category on the same figure, cleared in between
+    fig, ax = plt.subplots(figsize=(15, 8))
     for category, data in keypoints_data.items():
-        plt.figure(figsize=(15, 8))
+        ax.clear()
         
         # Get top 6 transitions
         top_transitions = data.head(6)
@@ -115,36 +123,43 @@ def create_keypoints_visualization():
                  for _, row in top_transitions.iterrows()]
         
         # Create the plot with primary color
-        bars = plt.bar(range(len(labels)), top_transitions['percentage'], color=PRIMARY_COLOR)
+        bars = ax.bar(range(len(labels)), top_transitions['percentage'], color=PRIMARY_COLOR)
         
         # Add percentage labels on top of bars
         for bar in bars:
             height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height,
+            ax.text(bar.get_x() + bar.get_width()/2., height,
                     f'{height:.1f}%',
                     ha='center', va='bottom')
         
         category_name = category.replace('_', ' ').title()
-        plt.title(f'Critical Handover Points in {category_name} Process')
-        plt.xlabel('Activity Transition')
-        plt.ylabel('Percentage of Handovers')
-        plt.xticks(range(len(labels)), labels, rotation=45, ha='right')
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, f'critical_handover_points_{category}.png'), dpi=300, bbox_inches='tight')
-        plt.close()
+        ax.set_title(f'Critical Handover Points in {category_name} Process')
+        ax.set_xlabel('Activity Transition')
+        ax.set_ylabel('Percentage of Handovers')
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+        fig.tight_layout()
+        fig.savefig(os.path.join(OUTPUT_DIR, f'critical_handover_points_{category}.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
 
 # 3. Role Interaction Network for all variants
 def create_role_interaction_heatmap():
-    for category in handovers_df['category'].unique():
-        plt.figure(figsize=(12, 10))
-        
-        # Create matrix of role interactions
-        role_matrix = pd.pivot_table(
-            handovers_df[handovers_df['category'] == category],
-            values='percentage',
-            index='from_role',
-            columns='to_role',
-            fill_value=0
+    # Draw the heatmap of every category on the same figure (with a fixed axes for the
+    # colorbar, so it is not added again for every category), cleared in between
+    fig, (ax, cbar_ax) = plt.subplots(1, 2, figsize=(12, 10), gridspec_kw={'width_ratios': [20, 1]})
+    for category, category_data in CATEGORY_FRAMES.items():
+        ax.clear()
+        cbar_ax.clear()
+        
+        # Create matrix of role interactions (one row per role pair, scattered into sorted role codes)
+        from_codes, from_roles = pd.factorize(category_data['from_role'], sort=True)
+        to_codes, to_roles = pd.factorize(category_data['to_role'], sort=True)
+        matrix = np.zeros((len(from_roles), len(to_roles)))
+        np.add.at(matrix, (from_codes, to_codes), category_data['percentage'].to_numpy())
+        role_matrix = pd.DataFrame(
+            matrix,
+            index=pd.Index(from_roles, name='from_role'),
+            columns=pd.Index(to_roles, name='to_role')
         )
         
         # Create custom colormap from secondary to primary color
@@ -155,15 +170,17 @@ def create_role_interaction_heatmap():
                     annot=True, 
                     fmt='.1f',
                     cmap=custom_cmap,
-                    cbar_kws={'label': 'Percentage of Handovers'})
+                    cbar_kws={'label': 'Percentage of Handovers'},
+                    ax=ax,
+                    cbar_ax=cbar_ax)
         
         category_name = category.replace('_', ' ').title()
-        plt.title(f'Role Interaction Heatmap ({category_name})')
-        plt.xlabel('To Role')
-        plt.ylabel('From Role')
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, f'role_interaction_heatmap_{category}.png'), dpi=300, bbox_inches='tight')
-        plt.close()
+        ax.set_title(f'Role Interaction Heatmap ({category_name})')
+        ax.set_xlabel('To Role')
+        ax.set_ylabel('From Role')
+        fig.tight_layout()
+        fig.savefig(os.path.join(OUTPUT_DIR, f'role_interaction_heatmap_{category}.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
 
 # 4. Process Flow Comparison
 def create_process_flow():
@@ -195,9 +212,9 @@ def create_process_flow():
         ax.set_ylim(-0.5, max(y_positions) + 0.5)
         ax.set_yticks([])
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, 'process_flow_comparison.png'), dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(os.path.join(OUTPUT_DIR, 'process_flow_comparison.png'), dpi=PLOT_DPI, bbox_inches='tight')
+    plt.close(fig)
 
 if __name__ == "__main__":
     create_top_handovers_plot()
@@ -1,3 +1,5 @@
+import matplotlib
+matplotlib.use('Agg')  # Only files are written, no GUI backend needed
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
@@ -6,6 +8,12 @@ import numpy as np
 # Set style
 plt.style.use('default')
 sns.set_theme(style="whitegrid")
+# Simplify paths as much as possible when rasterizing (the charts only contain simple shapes)
+plt.rcParams['path.simplify_threshold'] = 1.0
+
+# All charts are drawn on the axes of a single figure, each axis is saved to its own file
+fig, axes = plt.subplots(3, 2, figsize=(20, 18), constrained_layout=True)
+output_paths = []
 
 # Data for correlation analysis
 correlation_data = {
@@ -14,25 +22,25 @@ correlation_data = {
     'P-value': [3.97e-308, 0.0, 7.81e-1],
     'Number of Cases': [7931, 147240, 17]
 }
+# Shared by the correlation and case volume charts, indexed by process variant (the bar labels)
+correlation_df = pd.DataFrame(correlation_data).set_index('Process Variant')
 
 # Create correlation plot
-plt.figure(figsize=(10, 6))
-bars = plt.bar(correlation_data['Process Variant'], correlation_data['Correlation'], color='#00838f')
-plt.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-plt.title('Correlation between Number of Handovers and Case Duration')
-plt.ylabel('Correlation Coefficient')
-plt.xticks(rotation=45)
+ax = axes.flat[0]
+bars = ax.bar(correlation_df.index, correlation_df['Correlation'].to_numpy(), color='#00838f')
+ax.axhline(y=0, color='black', linestyle='-', alpha=0.3)
+ax.set_title('Correlation between Number of Handovers and Case Duration')
+ax.set_ylabel('Correlation Coefficient')
+ax.tick_params(axis='x', labelrotation=45)
 
 # Add value labels
 for bar in bars:
     height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{height:.3f}',
-             ha='center', va='bottom')
+    ax.text(bar.get_x() + bar.get_width()/2., height,
+            f'{height:.3f}',
+            ha='center', va='bottom')
 
-plt.tight_layout()
-plt.savefig('handover_keypoints_visualisations/correlation_analysis.png')
-plt.close()
+output_paths.append('handover_keypoints_visualisations/correlation_analysis.png')
 
 # Data for top handovers in 3-way After GR
 three_way_after_data = {
@@ -47,22 +55,20 @@ three_way_after_data = {
 }
 
 # Create bar plot for 3-way After GR
-plt.figure(figsize=(12, 6))
-bars = plt.bar(three_way_after_data['Handover'], three_way_after_data['Percentage'], color='#00838f')
-plt.title('Top 5 Handover Points in 3-way After GR Process')
-plt.ylabel('Percentage of Total Handovers')
-plt.xticks(rotation=45)
+ax = axes.flat[1]
+bars = ax.bar(three_way_after_data['Handover'], three_way_after_data['Percentage'], color='#00838f')
+ax.set_title('Top 5 Handover Points in 3-way After GR Process')
+ax.set_ylabel('Percentage of Total Handovers')
+ax.tick_params(axis='x', labelrotation=45)
 
 # Add value labels
 for bar in bars:
     height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{height:.2f}%',
-             ha='center', va='bottom')
+    ax.text(bar.get_x() + bar.get_width()/2., height,
+            f'{height:.2f}%',
+            ha='center', va='bottom')
 
-plt.tight_layout()
-plt.savefig('handover_keypoints_visualisations/three_way_after_handovers.png')
-plt.close()
+output_paths.append('handover_keypoints_visualisations/three_way_after_handovers.png')
 
 # Data for top handovers in 3-way Before GR
 three_way_before_data = {
@@ -77,41 +83,37 @@ three_way_before_data = {
 }
 
 # Create bar plot for 3-way Before GR
-plt.figure(figsize=(12, 6))
-bars = plt.bar(three_way_before_data['Handover'], three_way_before_data['Percentage'], color='#00838f')
-plt.title('Top 5 Handover Points in 3-way Before GR Process')
-plt.ylabel('Percentage of Total Handovers')
-plt.xticks(rotation=45)
+ax = axes.flat[2]
+bars = ax.bar(three_way_before_data['Handover'], three_way_before_data['Percentage'], color='#00838f')
+ax.set_title('Top 5 Handover Points in 3-way Before GR Process')
+ax.set_ylabel('Percentage of Total Handovers')
+ax.tick_params(axis='x', labelrotation=45)
 
 # Add value labels
 for bar in bars:
     height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{height:.2f}%',
-             ha='center', va='bottom')
+    ax.text(bar.get_x() + bar.get_width()/2., height,
+            f'{height:.2f}%',
+            ha='center', va='bottom')
 
-plt.tight_layout()
-plt.savefig('handover_keypoints_visualisations/three_way_before_handovers.png')
-plt.close()
+output_paths.append('handover_keypoints_visualisations/three_way_before_handovers.png')
 
 # Create case volume comparison
-plt.figure(figsize=(10, 6))
-bars = plt.bar(correlation_data['Process Variant'], correlation_data['Number of Cases'], color='#00838f')
-plt.title('Number of Cases by Process Variant')
-plt.ylabel('Number of Cases (log scale)')
-plt.yscale('log')
-plt.xticks(rotation=45)
+ax = axes.flat[3]
+bars = ax.bar(correlation_df.index, correlation_df['Number of Cases'].to_numpy(), color='#00838f')
+ax.set_title('Number of Cases by Process Variant')
+ax.set_ylabel('Number of Cases (log scale)')
+ax.set_yscale('log')
+ax.tick_params(axis='x', labelrotation=45)
 
 # Add value labels
 for bar in bars:
     height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'{int(height):,}',
-             ha='center', va='bottom')
+    ax.text(bar.get_x() + bar.get_width()/2., height,
+            f'{int(height):,}',
+            ha='center', va='bottom')
 
-plt.tight_layout()
-plt.savefig('handover_keypoints_visualisations/case_volume_comparison.png')
-plt.close()
+output_paths.append('handover_keypoints_visualisations/case_volume_comparison.png')
 
 # Role distribution data for 3-way After GR top handover
 role_distribution_after = {
@@ -120,11 +122,10 @@ role_distribution_after = {
 }
 
 # Create pie chart for role distribution
-plt.figure(figsize=(10, 8))
-plt.pie(role_distribution_after['Percentage'], labels=role_distribution_after['Role'], autopct='%1.1f%%')
-plt.title('Role Distribution for Top Handover in 3-way After GR\n(Record Goods Receipt → Record Service Entry Sheet)')
-plt.savefig('handover_keypoints_visualisations/role_distribution_after.png')
-plt.close()
+ax = axes.flat[4]
+ax.pie(role_distribution_after['Percentage'], labels=role_distribution_after['Role'], autopct='%1.1f%%')
+ax.set_title('Role Distribution for Top Handover in 3-way After GR\n(Record Goods Receipt → Record Service Entry Sheet)')
+output_paths.append('handover_keypoints_visualisations/role_distribution_after.png')
 
 # Role distribution data for 3-way Before GR top handover
 role_distribution_before = {
@@ -133,8 +134,14 @@ role_distribution_before = {
 }
 
 # Create pie chart for role distribution
-plt.figure(figsize=(10, 8))
-plt.pie(role_distribution_before['Percentage'], labels=role_distribution_before['Role'], autopct='%1.1f%%')
-plt.title('Role Distribution for Top Handover in 3-way Before GR\n(Record Invoice Receipt → Clear Invoice)')
-plt.savefig('handover_keypoints_visualisations/role_distribution_before.png')
-plt.close() 
\ No newline at end of file
+ax = axes.flat[5]
+ax.pie(role_distribution_before['Percentage'], labels=role_distribution_before['Role'], autopct='%1.1f%%')
+ax.set_title('Role Distribution for Top Handover in 3-way Before GR\n(Record Invoice Receipt → Clear Invoice)')
+output_paths.append('handover_keypoints_visualisations/role_distribution_before.png')
+
+# Save each axis to its own file, cropped to the area the axis covers on the shared figure
+fig.canvas.draw()
+renderer = fig.canvas.get_renderer()
+for ax, path in zip(axes.flat, output_paths):
+    bbox = ax.get_tightbbox(renderer).transformed(fig.dpi_scale_trans.inverted()).padded(0.05)
+    fig.savefig(path, bbox_inches=bbox)
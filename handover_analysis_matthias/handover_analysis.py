@@ -7,12 +7,18 @@ It identifies and counts role-to-role handovers within each process category.
 """
 
 import os
+import sys
 import logging
 import time
-from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import numpy as np
 import pm4py
-from pm4py.objects.log.importer.xes import importer as xes_importer
+from lxml import etree
+
+# The XES import helpers shared by the scripts are in analyze_logs.py in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_logs import XES_IMPORT_VARIANT
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +31,10 @@ logger = logging.getLogger(__name__)
 INPUT_DIR = './data/filtered/preprocessed_handover/preprocessed_categorized_logs'
 OUTPUT_DIR = './data/analysis/handovers'
 
+# Event DataFrame columns (ROLE_KEY holds the role of the user that executed the event)
+CASE_ID_KEY = 'case:concept:name'
+ROLE_KEY = 'userRole'
+
 # Item categories for analysis - only 2_way for testing
 ITEM_CATEGORIES = {
     "3_way_after": ["3-way match, invoice after GR"],
@@ -33,12 +43,57 @@ ITEM_CATEGORIES = {
     "consignment": ["Consignment"]
 }
 
+# Stream the XES files and keep only the case id and role of each event, which keeps the
+# memory use of every worker low; set to False to load the full logs with PM4Py instead
+# (faster with rustxes, but holds all event attributes in memory)
+STREAM_XES_LOGS = True
+
+# Number of worker processes for analyzing the categories in parallel (one per category at most)
+CATEGORY_WORKERS = os.cpu_count() or 1
+
+def stream_role_events(xes_file):
+    """
+    Read the case id and role of every event of an XES file into an event DataFrame
+    
+    The file is parsed incrementally and each trace is discarded once it has been read,
+    so only the two extracted columns are kept in memory.
+    
+    Args:
+        xes_file: Path to the XES file
+        
+    Returns:
+        DataFrame with CASE_ID_KEY and ROLE_KEY columns, one row per event in file order
+        (events without a role get None)
+    """
+    case_ids = []
+    roles = []
+    trace_roles = []
+    
+    for _, elem in etree.iterparse(xes_file, events=("end",), tag=("{*}event", "{*}trace")):
+        if etree.QName(elem).localname == "event":
+            trace_roles.append(next((child.get("value") for child in elem if child.get("key") == ROLE_KEY), None))
+            elem.clear()
+            continue
+        
+        # The case id is a direct attribute of the trace, its events have been collected by now
+        case_id = next((child.get("value") for child in elem if child.get("key") == "concept:name"), None)
+        case_ids.extend([case_id] * len(trace_roles))
+        roles.extend(trace_roles)
+        trace_roles = []
+        
+        # Drop the trace and everything parsed before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    return pd.DataFrame({CASE_ID_KEY: case_ids, ROLE_KEY: roles})
+
 def analyze_handover_pairs(log, category_name):
     """
     Analyze handover pairs in a log for a specific category.
     
     Args:
-        log: PM4Py event log
+        log: Event DataFrame with the events of each case in consecutive rows
         category_name: Name of the category being analyzed
         
     Returns:
@@ -46,55 +101,101 @@ def analyze_handover_pairs(log, category_name):
     """
     start_time = time.time()
     logger.info(f"Starting handover analysis for {category_name}")
-    logger.info(f"Number of cases in log: {len(log)}")
-    
-    handover_counts = Counter()
-    total_handovers = 0
-    
-    # Process each case
-    for case_idx, case in enumerate(log):
-        if case_idx % 10 == 0:  # Log progress every 10 cases
-            elapsed_time = time.time() - start_time
-            logger.info(f"Processing case {case_idx} of {len(log)} (elapsed time: {elapsed_time:.2f}s)")
-            
-        # Get all events in the case
-        events = list(case)
-        logger.info(f"Case {case_idx} has {len(events)} events")
-        
-        # Compare consecutive events for role changes
-        for i in range(len(events) - 1):
-            current_event = events[i]
-            next_event = events[i + 1]
-            
-            # Get roles from events using userRole attribute
-            current_role = current_event.get("userRole", "UNKNOWN")
-            next_role = next_event.get("userRole", "UNKNOWN")
-            
-            # If roles are different, record the handover
-            if current_role != next_role or current_role == "unclear" or next_role != "unclear":
-                handover_pair = (current_role, next_role)
-                handover_counts[handover_pair] += 1
-                total_handovers += 1
-    
-    logger.info(f"Found {total_handovers} total handovers in {len(handover_counts)} unique pairs")
+    logger.info(f"Number of events in log: {len(log)}")
+    
+    # Consecutive rows of the same case are consecutive events
+    case_ids = log[CASE_ID_KEY].to_numpy()
+    same_case = case_ids[:-1] == case_ids[1:]
+    
+    # Encode the few distinct roles as integer codes, so comparisons and grouping work on codes
+    # (events without a role get the trailing "UNKNOWN" code)
+    if ROLE_KEY in log.columns:
+        role_codes, role_names = pd.factorize(log[ROLE_KEY])
+    else:
+        role_codes, role_names = np.full(len(log), -1, dtype=np.intp), pd.Index([])
+    if (role_codes == -1).any():
+        if "UNKNOWN" in role_names:
+            role_codes[role_codes == -1] = role_names.get_loc("UNKNOWN")
+        else:
+            role_codes[role_codes == -1] = len(role_names)
+            role_names = role_names.append(pd.Index(["UNKNOWN"]))
+    
+    # Compare consecutive events of the same case for role changes
+    current_roles = role_codes[:-1][same_case]
+    next_roles = role_codes[1:][same_case]
+    
+    # If roles are different, record the handover in a from x to count matrix
+    is_handover = current_roles != next_roles
+    n_roles = len(role_names)
+    pair_codes = current_roles[is_handover] * n_roles + next_roles[is_handover]
+    count_matrix = np.bincount(pair_codes, minlength=n_roles * n_roles).reshape(n_roles, n_roles)
+    from_codes, to_codes = np.nonzero(count_matrix)
+    handover_counts = count_matrix[from_codes, to_codes]
+    total_handovers = int(handover_counts.sum())
+    
+    elapsed_time = time.time() - start_time
+    logger.info(f"Found {total_handovers} total handovers in {len(handover_counts)} unique pairs (elapsed time: {elapsed_time:.2f}s)")
     
     # Convert to DataFrame
-    if handover_counts:
-        df = pd.DataFrame([
-            {
-                'from_role': pair[0],
-                'to_role': pair[1],
-                'count': count,
-                'percentage': (count / total_handovers) * 100
-            }
-            for pair, count in handover_counts.items()
-        ])
+    if len(handover_counts):
+        df = pd.DataFrame({
+            'from_role': role_names[from_codes],
+            'to_role': role_names[to_codes],
+            'count': handover_counts
+        })
+        df['percentage'] = df['count'] / total_handovers * 100
         df = df.sort_values('count', ascending=False)
         df['category'] = category_name
         return df
     else:
         return pd.DataFrame(columns=['from_role', 'to_role', 'count', 'percentage', 'category'])
 
+def process_category(category_item):
+    """
+    Load and analyze the log of a single category and save its handovers.
+    
+    Args:
+        category_item: (category_name, category_values) item of ITEM_CATEGORIES
+        
+    Returns:
+        Tuple of (category_name, results DataFrame), the DataFrame is None when the
+        file is missing or could not be processed
+    """
+    category_name, category_values = category_item
+    logger.info(f"\nProcessing category: {category_name}")
+    
+    # Find and load the XES file
+    xes_file = os.path.join(INPUT_DIR, f"group_{category_name}.xes")
+    logger.info(f"Looking for file: {xes_file}")
+    
+    if not os.path.exists(xes_file):
+        logger.warning(f"File not found: {xes_file}")
+        return category_name, None
+    
+    try:
+        # Load and analyze the log
+        logger.info(f"Loading log file: {xes_file}")
+        if STREAM_XES_LOGS:
+            log = stream_role_events(xes_file)
+        else:
+            log = pm4py.read_xes(xes_file, variant=XES_IMPORT_VARIANT, return_legacy_log_object=False)
+        logger.info(f"Successfully loaded log with {len(log)} events")
+        
+        # Analyze handovers
+        results_df = analyze_handover_pairs(log, category_name)
+        
+        # Save category results
+        output_file = os.path.join(OUTPUT_DIR, f"handovers_{category_name}.csv")
+        results_df.to_csv(output_file, index=False)
+        logger.info(f"Saved results to {output_file}")
+        
+        return category_name, results_df
+        
+    except Exception:
+        # Logs the error together with its traceback
+        logger.exception("Error processing %s", category_name)
+        return category_name, None
+
 def main():
     """Main function to analyze handovers across all categories."""
     start_time = time.time()
@@ -108,37 +209,11 @@ def main():
     # Store results for all categories
     category_results = {}
     
-    for category_name, category_values in ITEM_CATEGORIES.items():
-        logger.info(f"\nProcessing category: {category_name}")
-        
-        # Find and load the XES file
-        xes_file = os.path.join(INPUT_DIR, f"group_{category_name}.xes")
-        logger.info(f"Looking for file: {xes_file}")
-        
-        if not os.path.exists(xes_file):
-            logger.warning(f"File not found: {xes_file}")
-            continue
-        
-        try:
-            # Load and analyze the log
-            logger.info(f"Loading log file: {xes_file}")
-            log = xes_importer.apply(xes_file)
-            logger.info(f"Successfully loaded log with {len(log)} cases")
-            
-            # Analyze handovers
-            results_df = analyze_handover_pairs(log, category_name)
-            
-            # Save category results
-            output_file = os.path.join(OUTPUT_DIR, f"handovers_{category_name}.csv")
-            results_df.to_csv(output_file, index=False)
-            logger.info(f"Saved results to {output_file}")
-            
-            category_results[category_name] = results_df
-            
-        except Exception as e:
-            logger.error(f"Error processing {category_name}: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+    # Each category is an independent file, so the categories are processed in parallel
+    with ProcessPoolExecutor(max_workers=max(1, min(CATEGORY_WORKERS, len(ITEM_CATEGORIES)))) as executor:
+        for category_name, results_df in executor.map(process_category, ITEM_CATEGORIES.items()):
+            if results_df is not None:
+                category_results[category_name] = results_df
     
     # Combine all results
     if category_results:
@@ -33,6 +33,37 @@ ITEM_CATEGORIES = {
     "consignment": "Consignment"
 }
 
+# Keep a parquet copy of every analysis CSV next to it, later runs read that instead
+# of parsing the CSV again (as long as the CSV file has not changed since)
+CACHE_ANALYSIS_CSVS = True
+
+# Number of most frequent handover keypoints to report per category
+TOP_KEYPOINTS = 5
+
+# Columns of the keypoint transitions that are used (the file is written sorted by frequency)
+KEYPOINT_TRANSITION_COLUMNS = ['from_activity', 'to_activity', 'frequency']
+
+def read_analysis_csv(csv_path, usecols=None, nrows=None, **read_csv_kwargs):
+    """Read an analysis CSV file, using its parquet cache when it is up to date"""
+    cache_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if CACHE_ANALYSIS_CSVS and os.path.exists(cache_path) and os.path.getmtime(cache_path) > os.path.getmtime(csv_path):
+        df = pd.read_parquet(cache_path, columns=usecols)
+        return df if nrows is None else df.head(nrows)
+    
+    if not CACHE_ANALYSIS_CSVS:
+        return pd.read_csv(csv_path, usecols=usecols, nrows=nrows, **read_csv_kwargs)
+    
+    # The cache holds the complete file, so it serves any selection of columns and rows
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    try:
+        df.to_parquet(cache_path)
+    except Exception as e:
+        # Caching is only an optimization (e.g. pyarrow may not be installed)
+        logger.warning(f"Could not cache {csv_path} as {cache_path}: {str(e)}")
+    if usecols is not None:
+        df = df[usecols]
+    return df if nrows is None else df.head(nrows)
+
 def load_category_data(category):
     """Load all analysis data for a specific category."""
     data = {}
@@ -40,8 +71,8 @@ def load_category_data(category):
     # Load duration data
     duration_path = os.path.join(ANALYSIS_DIR, 'handover_duration')
     try:
-        data['duration_role'] = pd.read_csv(os.path.join(duration_path, f'duration_{category}_role_level.csv'))
-        data['duration_user'] = pd.read_csv(os.path.join(duration_path, f'duration_{category}_user_level.csv'))
+        data['duration_role'] = read_analysis_csv(os.path.join(duration_path, f'duration_{category}_role_level.csv'))
+        data['duration_user'] = read_analysis_csv(os.path.join(duration_path, f'duration_{category}_user_level.csv'))
     except Exception as e:
         logger.warning(f"Could not load duration data for {category}: {e}")
         return None
@@ -49,15 +80,21 @@ def load_category_data(category):
     # Load keypoints data
     keypoints_path = os.path.join(ANALYSIS_DIR, 'handover_keypoints')
     try:
-        data['keypoints_roles'] = pd.read_csv(os.path.join(keypoints_path, f'keypoints_{category}_roles.csv'))
-        data['keypoints_transitions'] = pd.read_csv(os.path.join(keypoints_path, f'keypoints_{category}_transitions.csv'))
+        data['keypoints_roles'] = read_analysis_csv(os.path.join(keypoints_path, f'keypoints_{category}_roles.csv'))
+        # Only the top keypoints are used, which are the first rows of the sorted transitions file
+        data['keypoints_transitions'] = read_analysis_csv(
+            os.path.join(keypoints_path, f'keypoints_{category}_transitions.csv'),
+            usecols=KEYPOINT_TRANSITION_COLUMNS,
+            dtype={'frequency': 'int32'},
+            nrows=TOP_KEYPOINTS
+        )
     except Exception as e:
         logger.warning(f"Could not load keypoints data for {category}: {e}")
     
     # Load handover pairs data
     handovers_path = os.path.join(ANALYSIS_DIR, 'handovers')
     try:
-        data['handovers'] = pd.read_csv(os.path.join(handovers_path, f'handovers_{category}.csv'))
+        data['handovers'] = read_analysis_csv(os.path.join(handovers_path, f'handovers_{category}.csv'))
     except Exception as e:
         logger.warning(f"Could not load handovers data for {category}: {e}")
     
@@ -70,10 +107,27 @@ def analyze_duration_correlation(data, category):
     if 'duration_role' in data:
         df = data['duration_role']
         
-        # Calculate correlations
+        # Calculate both correlations at once from the centered handover counts and durations
+        handovers = df[['total_handovers', 'unique_handovers']].to_numpy(dtype=float)
+        duration = df['duration'].to_numpy(dtype=float)
+        handovers_centered = handovers - handovers.mean(axis=0)
+        duration_centered = duration - duration.mean()
+        covariance = handovers_centered.T @ duration_centered
+        handovers_ss = (handovers_centered * handovers_centered).sum(axis=0)
+        # Rounding can push a perfect correlation slightly beyond +-1
+        r = np.clip(covariance / np.sqrt(handovers_ss * (duration_centered @ duration_centered)), -1.0, 1.0)
+
+        # Two-sided p-values of the correlations (t-test with n - 2 degrees of freedom), like
+        # scipy's pearsonr: 1 for two cases (the line through them always fits), 0 for |r| = 1
+        dof = len(duration) - 2
+        if dof > 0:
+            with np.errstate(divide='ignore'):
+                p_values = 2 * stats.t.sf(np.abs(r) * np.sqrt(dof / (1 - r * r)), dof)
+        else:
+            p_values = np.ones_like(r)
         correlations = {
-            'total_handovers': stats.pearsonr(df['total_handovers'], df['duration']),
-            'unique_handovers': stats.pearsonr(df['unique_handovers'], df['duration'])
+            'total_handovers': (r[0], p_values[0]),
+            'unique_handovers': (r[1], p_values[1])
         }
         
         # Basic statistics
@@ -94,10 +148,10 @@ def analyze_duration_correlation(data, category):
         plt.xlabel('Number of Handovers')
         plt.ylabel('Case Duration (hours)')
         
-        # Add correlation line
-        z = np.polyfit(df['total_handovers'], df['duration'], 1)
-        p = np.poly1d(z)
-        plt.plot(df['total_handovers'], p(df['total_handovers']), "r--", alpha=0.8)
+        # Add correlation line (least squares fit of duration on total handovers)
+        slope = covariance[0] / handovers_ss[0]
+        intercept = duration.mean() - slope * handovers[:, 0].mean()
+        plt.plot(handovers[:, 0], intercept + slope * handovers[:, 0], "r--", alpha=0.8)
         
         # Add correlation coefficient
         corr = correlations['total_handovers'][0]
@@ -122,7 +176,7 @@ def analyze_keypoint_impact(data, category):
         keypoints = data['keypoints_transitions']
         
         # Get top 5 most frequent handover points
-        top_keypoints = keypoints.nlargest(5, 'frequency')
+        top_keypoints = keypoints.nlargest(TOP_KEYPOINTS, 'frequency')
         results['top_keypoints'] = top_keypoints.to_dict('records')
         
         # Calculate average duration for cases with different numbers of unique handovers
@@ -7,15 +7,22 @@ It aims to identify whether specific handover patterns are associated with longe
 """
 
 import os
+import sys
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import pandas as pd
 import numpy as np
 from scipy import stats
 import seaborn as sns
+import matplotlib
+matplotlib.use('Agg')  # Only files are written, no GUI backend needed
 import matplotlib.pyplot as plt
-from pm4py.objects.log.importer.xes import importer as xes_importer
-from pm4py.util import constants
+import pm4py
+
+# The XES import helpers shared by the scripts are in analyze_logs.py in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_logs import XES_IMPORT_VARIANT
 
 # Configure logging
 logging.basicConfig(
@@ -36,33 +43,94 @@ ITEM_CATEGORIES = {
     "consignment": ["group_consignment.xes"]
 }
 
-def calculate_case_duration(case):
-    """Calculate the duration of a case in hours."""
-    timestamps = [event["time:timestamp"] for event in case]
-    duration = max(timestamps) - min(timestamps)
-    return duration.total_seconds() / 3600  # Convert to hours
+# Number of worker processes for analyzing the categories in parallel (one per category at most)
+CATEGORY_WORKERS = os.cpu_count() or 1
+
+# Skip categories whose results are newer than their XES file (set to False to always re-analyze)
+SKIP_UP_TO_DATE_RESULTS = True
+
+# Also save the per-case results as parquet, which handover_duration_correlation.py loads faster
+WRITE_PARQUET_RESULTS = True
+
+# Above this number of cases the duration scatter plot is drawn as a hexbin plot
+SCATTER_HEXBIN_THRESHOLD = 50_000
+
+# Event DataFrame columns
+CASE_ID_KEY = 'case:concept:name'
+TIMESTAMP_KEY = 'time:timestamp'
+RESOURCE_KEY = 'org:resource'
+ROLE_KEY = 'userRole'
+
+def get_roles(resources):
+    """
+    Extract the roles from an array of resource identifiers.
+    
+    "NONE" and empty resources have role "NONE", batch resources "BATCH", users "ROLE_"
+    followed by the first two digits after 'user_' ("UNKNOWN" without them), and any
+    other resource is its own role.
+    """
+    resources = pd.Series(resources, dtype=object)
+    # First two characters of the part after the first '_' (missing without a '_')
+    role_numbers = resources.str.extract(r'^[^_]*_([^_]{0,2})', expand=False)
+    roles = np.where(resources.str.startswith("user", na=False), ("ROLE_" + role_numbers).fillna("UNKNOWN"), resources)
+    roles = np.where(resources.str.startswith("batch", na=False), "BATCH", roles)
+    roles = np.where(resources.isna() | (resources == "NONE") | (resources == ""), "NONE", roles)
+    return roles.astype(object)
 
 def get_role(resource):
     """Extract role from resource identifier."""
-    if resource == "NONE" or not resource:
-        return "NONE"
-    if resource.startswith("batch"):
-        return "BATCH"
-    if resource.startswith("user"):
-        # Extract the role number (first 2 digits after 'user_')
-        try:
-            role_num = resource.split('_')[1][:2]  # Take first two digits
-            return f"ROLE_{role_num}"
-        except:
-            return "UNKNOWN"
-    return resource
+    return get_roles([resource])[0]
+
+def summarize_case_handovers(handover_cases, handover_from, handover_to, names, n_cases):
+    """
+    Summarize the handovers of every case.
+    
+    Args:
+        handover_cases: Case number (0 to n_cases - 1) of every handover, in event order
+        handover_from: Code of the resource or role handing over the case, per handover
+        handover_to: Code of the resource or role taking over the case, per handover
+        names: Resource or role name of each code
+        n_cases: Number of cases
+        
+    Returns:
+        DataFrame with the total_handovers, unique_handovers, most_frequent_handover
+        and most_frequent_count of each case, one row per case number
+    """
+    total_handovers = np.bincount(handover_cases, minlength=n_cases)
+    
+    # Count every distinct (case, from, to) handover with a single combined integer key
+    n_names = len(names)
+    pair_codes = handover_from.astype(np.int64) * n_names + handover_to
+    keys = handover_cases.astype(np.int64) * (n_names * n_names) + pair_codes
+    unique_keys, first_positions, pair_counts = np.unique(keys, return_index=True, return_counts=True)
+    pair_cases, unique_pairs = np.divmod(unique_keys, n_names * n_names)
+    unique_handovers = np.bincount(pair_cases, minlength=n_cases)
+    
+    # Most frequent handover of each case (the first one to occur on ties): order the pairs by
+    # case, then by descending count and first occurrence, and take the first pair of every case
+    order = np.lexsort((first_positions, -pair_counts, pair_cases))
+    is_case_first = np.diff(pair_cases[order], prepend=-1) != 0
+    top = order[is_case_first]
+    top_from, top_to = np.divmod(unique_pairs[top], n_names)
+    
+    most_freq_handover = np.full(n_cases, "NONE", dtype=object)
+    most_freq_handover[pair_cases[top]] = [f"{names[f]}->{names[t]}" for f, t in zip(top_from, top_to)]
+    most_freq_count = np.zeros(n_cases, dtype=np.int64)
+    most_freq_count[pair_cases[top]] = pair_counts[top]
+    
+    return pd.DataFrame({
+        'total_handovers': total_handovers,
+        'unique_handovers': unique_handovers,
+        'most_frequent_handover': most_freq_handover,
+        'most_frequent_count': most_freq_count
+    })
 
 def analyze_handovers_and_duration(log, category_name):
     """
     Analyze handovers and their relationship with case duration.
     
     Args:
-        log: PM4Py event log
+        log: Event DataFrame with the events of each case in consecutive rows
         category_name: Name of the category being analyzed
         
     Returns:
@@ -71,164 +139,169 @@ def analyze_handovers_and_duration(log, category_name):
     """
     logger.info(f"Analyzing handovers and duration for {category_name}")
     
-    user_case_data = []
-    role_case_data = []
+    # Number the cases in order of appearance
+    case_codes, case_ids = pd.factorize(log[CASE_ID_KEY])
+    n_cases = len(case_ids)
+    logger.info(f"Processing {n_cases} cases with {len(log)} events")
     
-    for case_idx, case in enumerate(log):
-        if case_idx % 1000 == 0:
-            logger.info(f"Processing case {case_idx} of {len(log)}")
-        
-        case_id = case.attributes["concept:name"]
-        duration = calculate_case_duration(case)
-        
-        # Debug logging for first few cases
-        if case_idx < 3:
-            logger.info(f"\nDebug - Case {case_id}:")
-            logger.info(f"Duration: {duration:.2f} hours")
-            logger.info("First few events:")
-            for i, event in enumerate(list(case)[:5]):
-                logger.info(f"Event {i}: Resource={event.get('org:resource', 'NONE')}, Role={event.get('userRole', 'UNKNOWN')}")
-        
-        # Analyze handovers in the case
-        user_handovers = []
-        role_handovers = []
-        events = list(case)
-        
-        for i in range(len(events) - 1):
-            current_user = events[i].get("org:resource", "NONE")
-            next_user = events[i + 1].get("org:resource", "NONE")
-            
-            # Get role from resource if not directly available
-            current_role = get_role(current_user)
-            next_role = get_role(next_user)
-            
-            if current_user != next_user and current_user != "NONE" and next_user != "NONE":
-                user_handovers.append((current_user, next_user))
-            
-            if current_role != next_role and current_role != "NONE" and next_role != "NONE":
-                role_handovers.append((current_role, next_role))
-        
-        # Debug logging for first few cases
-        if case_idx < 3:
-            logger.info(f"User handovers: {user_handovers}")
-            logger.info(f"Role handovers: {role_handovers}")
-        
-        # User-level analysis
-        user_total_handovers = len(user_handovers)
-        user_unique_handovers = len(set(user_handovers))
-        
-        if user_handovers:
-            from collections import Counter
-            most_common = Counter(user_handovers).most_common(1)[0]
-            user_most_freq_handover = f"{most_common[0][0]}->{most_common[0][1]}"
-            user_most_freq_count = most_common[1]
-        else:
-            user_most_freq_handover = "NONE"
-            user_most_freq_count = 0
-        
-        # Role-level analysis
-        role_total_handovers = len(role_handovers)
-        role_unique_handovers = len(set(role_handovers))
-        
-        if role_handovers:
-            most_common = Counter(role_handovers).most_common(1)[0]
-            role_most_freq_handover = f"{most_common[0][0]}->{most_common[0][1]}"
-            role_most_freq_count = most_common[1]
-        else:
-            role_most_freq_handover = "NONE"
-            role_most_freq_count = 0
-        
-        user_case_data.append({
-            'case_id': case_id,
-            'duration': duration,
-            'total_handovers': user_total_handovers,
-            'unique_handovers': user_unique_handovers,
-            'most_frequent_handover': user_most_freq_handover,
-            'most_frequent_count': user_most_freq_count
-        })
-        
-        role_case_data.append({
-            'case_id': case_id,
-            'duration': duration,
-            'total_handovers': role_total_handovers,
-            'unique_handovers': role_unique_handovers,
-            'most_frequent_handover': role_most_freq_handover,
-            'most_frequent_count': role_most_freq_count
-        })
-    
-    return pd.DataFrame(user_case_data), pd.DataFrame(role_case_data)
+    # Events without a resource count as "NONE", their role is derived from the resource
+    resources = log.reindex(columns=[RESOURCE_KEY])[RESOURCE_KEY].astype(object).fillna("NONE")
+    
+    # Encode the resources as integer codes, and derive the role of each distinct resource only once,
+    # so the handover scan compares integers instead of strings
+    user_codes, user_names = pd.factorize(resources)
+    role_of_user, role_names = pd.factorize(get_roles(user_names))
+    role_codes = role_of_user[user_codes]
+    no_user = pd.Index(user_names).get_indexer(["NONE"])[0]
+    no_role = pd.Index(role_names).get_indexer(["NONE"])[0]
+    
+    # Pair every event with the next event of the same case (consecutive rows)
+    same_case = case_codes[:-1] == case_codes[1:]
+    current_users, next_users = user_codes[:-1], user_codes[1:]
+    current_roles, next_roles = role_codes[:-1], role_codes[1:]
+    
+    # A handover is a change of user (or role) between two events that both have one
+    is_user_handover = same_case & (current_users != next_users) & (current_users != no_user) & (next_users != no_user)
+    # With at most one role (besides NONE) there cannot be any role handovers, skip the role scan
+    if len(role_names) - (no_role >= 0) > 1:
+        is_role_handover = same_case & (current_roles != next_roles) & (current_roles != no_role) & (next_roles != no_role)
+    else:
+        logger.info(f"Only one role in {category_name}, skipping the role handover scan")
+        is_role_handover = np.zeros_like(same_case)
+    
+    # Duration of each case in hours (time between its first and last event)
+    case_timestamps = log.groupby(case_codes)[TIMESTAMP_KEY]
+    durations = ((case_timestamps.max() - case_timestamps.min()).dt.total_seconds() / 3600).to_numpy()
+    
+    # Debug logging for first few cases (only when debug logging is enabled)
+    if logger.isEnabledFor(logging.DEBUG):
+        for case in range(min(3, n_cases)):
+            positions = np.flatnonzero(case_codes == case)
+            handover_positions = positions[:-1]
+            logger.debug(f"\nDebug - Case {case_ids[case]}:")
+            logger.debug(f"Duration: {durations[case]:.2f} hours")
+            logger.debug("First few events:")
+            for i, position in enumerate(positions[:5]):
+                role = log[ROLE_KEY].iloc[position] if ROLE_KEY in log.columns else None
+                logger.debug(f"Event {i}: Resource={user_names[user_codes[position]]}, Role={'UNKNOWN' if pd.isna(role) else role}")
+            user_positions = handover_positions[is_user_handover[handover_positions]]
+            role_positions = handover_positions[is_role_handover[handover_positions]]
+            logger.debug(f"User handovers: {list(zip(user_names[current_users[user_positions]], user_names[next_users[user_positions]]))}")
+            logger.debug(f"Role handovers: {list(zip(role_names[current_roles[role_positions]], role_names[next_roles[role_positions]]))}")
+    
+    cases = pd.DataFrame({'case_id': case_ids, 'duration': durations})
+    
+    # User-level analysis
+    user_handovers = summarize_case_handovers(
+        case_codes[:-1][is_user_handover], current_users[is_user_handover], next_users[is_user_handover], user_names, n_cases
+    )
+    
+    # Role-level analysis
+    role_handovers = summarize_case_handovers(
+        case_codes[:-1][is_role_handover], current_roles[is_role_handover], next_roles[is_role_handover], role_names, n_cases
+    )
+    
+    return pd.concat([cases, user_handovers], axis=1), pd.concat([cases, role_handovers], axis=1)
+
+def pearson_correlation(df, column):
+    """Pearson correlation (r, p-value) between a handover column and the case duration, NaN when undefined."""
+    if len(df) > 1 and not df[column].isna().any() and not df['duration'].isna().any():
+        return stats.pearsonr(df[column], df['duration'])
+    return (np.nan, np.nan)
 
-def create_visualizations(df, category_name):
-    """Create visualizations for the handover-duration analysis."""
+# The plots of every category are drawn on the same figures (one per plot type), cleared in between
+SCATTER_FIG, SCATTER_AX = plt.subplots(figsize=(10, 6))
+BOXPLOT_FIG, BOXPLOT_AX = plt.subplots(figsize=(12, 6))
+TOP_HANDOVERS_FIG, TOP_HANDOVERS_AX = plt.subplots(figsize=(12, 6))
+
+def create_visualizations(df, category_name, correlation=None):
+    """
+    Create visualizations for the handover-duration analysis.
+    
+    Args:
+        df: Per-case results of the category
+        category_name: Name used in the plot titles and file names
+        correlation: Pearson correlation (r, p-value) of total handovers and duration,
+            computed from df when not given
+    """
     logger.info(f"Creating visualizations for {category_name}")
     
     # Create output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # 1. Scatter plot: Total handovers vs Duration
-    plt.figure(figsize=(10, 6))
-    plt.scatter(df['total_handovers'], df['duration'], alpha=0.5)
-    plt.title(f'Case Duration vs Total Handovers ({category_name})')
-    plt.xlabel('Number of Handovers')
-    plt.ylabel('Case Duration (hours)')
+    # 1. Scatter plot: Total handovers vs Duration (binned for large logs)
+    ax = SCATTER_AX
+    ax.clear()
+    if len(df) > SCATTER_HEXBIN_THRESHOLD:
+        ax.hexbin(df['total_handovers'], df['duration'], gridsize=50, mincnt=1, cmap='Blues')
+    else:
+        ax.scatter(df['total_handovers'], df['duration'], alpha=0.5)
+    ax.set_title(f'Case Duration vs Total Handovers ({category_name})')
+    ax.set_xlabel('Number of Handovers')
+    ax.set_ylabel('Case Duration (hours)')
     
     # Add correlation line
-    corr = stats.pearsonr(df['total_handovers'], df['duration'])[0]
-    plt.text(0.05, 0.95, f'Correlation: {corr:.2f}', 
-             transform=plt.gca().transAxes, 
-             bbox=dict(facecolor='white', alpha=0.8))
+    if correlation is None:
+        correlation = pearson_correlation(df, 'total_handovers')
+    corr = correlation[0]
+    ax.text(0.05, 0.95, f'Correlation: {corr:.2f}', 
+            transform=ax.transAxes, 
+            bbox=dict(facecolor='white', alpha=0.8))
     
-    plt.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_scatter.png'))
-    plt.close()
+    SCATTER_FIG.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_scatter.png'))
     
     # 2. Box plot: Duration distribution for different numbers of unique handovers
-    plt.figure(figsize=(12, 6))
-    df_grouped = df.groupby('unique_handovers')['duration'].apply(list)
-    plt.boxplot(df_grouped.values, labels=df_grouped.index)
-    plt.title(f'Case Duration Distribution by Unique Handovers ({category_name})')
-    plt.xlabel('Number of Unique Handovers')
-    plt.ylabel('Case Duration (hours)')
-    plt.xticks(rotation=45)
-    plt.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_boxplot.png'), 
-                bbox_inches='tight')
-    plt.close()
+    ax = BOXPLOT_AX
+    ax.clear()
+    sns.boxplot(x='unique_handovers', y='duration', data=df, ax=ax)
+    ax.set_title(f'Case Duration Distribution by Unique Handovers ({category_name})')
+    ax.set_xlabel('Number of Unique Handovers')
+    ax.set_ylabel('Case Duration (hours)')
+    ax.tick_params(axis='x', labelrotation=45)
+    BOXPLOT_FIG.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_boxplot.png'), 
+                        bbox_inches='tight')
     
     # 3. Top 10 most frequent handovers and their average durations
     top_handovers = df.groupby('most_frequent_handover').agg({
         'duration': ['mean', 'count']
     }).sort_values(('duration', 'count'), ascending=False).head(10)
     
-    plt.figure(figsize=(12, 6))
-    plt.bar(range(len(top_handovers)), top_handovers[('duration', 'mean')])
-    plt.title(f'Average Duration for Top 10 Most Frequent Handovers ({category_name})')
-    plt.xlabel('Handover Pattern')
-    plt.ylabel('Average Duration (hours)')
-    plt.xticks(range(len(top_handovers)), top_handovers.index, rotation=45, ha='right')
-    plt.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_top_handovers.png'),
-                bbox_inches='tight')
-    plt.close()
+    ax = TOP_HANDOVERS_AX
+    ax.clear()
+    ax.bar(range(len(top_handovers)), top_handovers[('duration', 'mean')])
+    ax.set_title(f'Average Duration for Top 10 Most Frequent Handovers ({category_name})')
+    ax.set_xlabel('Handover Pattern')
+    ax.set_ylabel('Average Duration (hours)')
+    ax.set_xticks(range(len(top_handovers)))
+    ax.set_xticklabels(top_handovers.index, rotation=45, ha='right')
+    TOP_HANDOVERS_FIG.savefig(os.path.join(OUTPUT_DIR, f'{category_name}_top_handovers.png'),
+                              bbox_inches='tight')
     
     return top_handovers
 
-def perform_statistical_analysis(df):
-    """Perform statistical analysis on the handover-duration relationship."""
-    # Calculate correlations
-    correlations = {}
-    
-    # Only calculate correlations if we have valid data
-    if len(df) > 1 and not df['total_handovers'].isna().any() and not df['duration'].isna().any():
-        correlations['total_handovers'] = stats.pearsonr(df['total_handovers'], df['duration'])
-    else:
-        correlations['total_handovers'] = (np.nan, np.nan)
+def perform_statistical_analysis(df, correlations=None):
+    """
+    Perform statistical analysis on the handover-duration relationship.
     
-    if len(df) > 1 and not df['unique_handovers'].isna().any() and not df['duration'].isna().any():
-        correlations['unique_handovers'] = stats.pearsonr(df['unique_handovers'], df['duration'])
-    else:
-        correlations['unique_handovers'] = (np.nan, np.nan)
+    Args:
+        df: Per-case results of the category
+        correlations: Already computed Pearson correlations, keyed by handover column;
+            the missing ones are computed from df
+    """
+    # Calculate correlations (NaN when there is no valid data)
+    correlations = dict(correlations or {})
+    for column in ('total_handovers', 'unique_handovers'):
+        if column not in correlations:
+            correlations[column] = pearson_correlation(df, column)
     
     # Group cases by number of handovers and perform ANOVA
+    # Sorting by the number of handovers makes every group a contiguous slice of the durations
+    order = np.argsort(df['unique_handovers'].to_numpy(), kind='stable')
+    unique_handovers = df['unique_handovers'].to_numpy()[order]
+    group_starts = np.flatnonzero(np.diff(unique_handovers)) + 1
+    groups = np.split(df['duration'].to_numpy()[order], group_starts)
     # Only perform ANOVA if we have enough groups with data
-    groups = [group['duration'].values for name, group in df.groupby('unique_handovers') if len(group) > 1]
+    groups = [group for group in groups if len(group) > 1]
     if len(groups) >= 2:
         f_stat, p_value = stats.f_oneway(*groups)
     else:
@@ -239,6 +312,125 @@ def perform_statistical_analysis(df):
         'anova': (f_stat, p_value)
     }
 
+def result_csv_paths(category_name):
+    """Paths of the per-case result CSVs of a category (the parquet copies are optional)."""
+    return [os.path.join(OUTPUT_DIR, f"duration_{category_name}_{level}.csv") for level in ("user_level", "role_level")]
+
+def save_results(df, category_name, level):
+    """Save the per-case results of a category as CSV (and parquet, if enabled)."""
+    base_path = os.path.join(OUTPUT_DIR, f"duration_{category_name}_{level}")
+    df.to_csv(base_path + ".csv", index=False)
+    if WRITE_PARQUET_RESULTS:
+        try:
+            df.to_parquet(base_path + ".parquet", compression="zstd", index=False)
+        except Exception as e:
+            # The CSV is the main output (e.g. pyarrow may not be installed)
+            logger.warning(f"Could not save {base_path}.parquet: {str(e)}")
+
+def process_category(category_item):
+    """
+    Load, analyze and visualize the log of a single category and save its results.
+    
+    Args:
+        category_item: (category_name, category_files) item of ITEM_CATEGORIES
+        
+    Returns:
+        Tuple of (category_name, results dict), the results are None when the category
+        was skipped or could not be processed
+    """
+    category_name, category_files = category_item
+    logger.info(f"\nProcessing category: {category_name}")
+    
+    # Find and load the XES file
+    xes_file = os.path.join(INPUT_DIR, category_files[0])
+    
+    if not os.path.exists(xes_file):
+        logger.warning(f"File not found: {xes_file}")
+        return category_name, None
+    
+    # Skip the analysis when the result CSVs are newer than the log (changes to this script are not detected)
+    if SKIP_UP_TO_DATE_RESULTS:
+        xes_mtime = os.path.getmtime(xes_file)
+        if all(os.path.exists(path) and os.path.getmtime(path) > xes_mtime for path in result_csv_paths(category_name)):
+            logger.info(f"Results for {category_name} are newer than its log, skipping (set SKIP_UP_TO_DATE_RESULTS = False to re-analyze)")
+            return category_name, None
+        
+    try:
+        # Load and analyze the log
+        logger.info(f"Loading log file: {xes_file}")
+        log = pm4py.read_xes(xes_file, variant=XES_IMPORT_VARIANT, return_legacy_log_object=False)
+        logger.info(f"Successfully loaded log with {log[CASE_ID_KEY].nunique()} cases")
+        
+        # Print some debug information about the first case (only when debug logging is enabled)
+        if len(log) > 0 and logger.isEnabledFor(logging.DEBUG):
+            first_case = log[log[CASE_ID_KEY] == log[CASE_ID_KEY].iloc[0]]
+            logger.debug("\nDebug - First case attributes:")
+            for key, value in first_case.iloc[0].items():
+                if key.startswith("case:"):
+                    logger.debug(f"{key[len('case:'):]}: {value}")
+            logger.debug("\nDebug - First case events:")
+            for i, (_, event) in enumerate(first_case.head(5).iterrows()):
+                logger.debug(f"Event {i}:")
+                for key, value in event.dropna().items():
+                    if not key.startswith("case:"):
+                        logger.debug(f"  {key}: {value}")
+        
+        # Analyze handovers and duration
+        user_level_df, role_level_df = analyze_handovers_and_duration(log, category_name)
+        
+        # Print summary of the dataframes
+        logger.info("\nUser-level DataFrame Summary:")
+        logger.info(user_level_df.describe())
+        logger.info("\nRole-level DataFrame Summary:")
+        logger.info(role_level_df.describe())
+        
+        # The user-level correlation is shown in the scatter plot and reported in the statistics
+        user_level_correlation = pearson_correlation(user_level_df, 'total_handovers')
+        
+        # Create visualizations
+        create_visualizations(user_level_df, f"{category_name}_user_level", user_level_correlation)
+        create_visualizations(role_level_df, f"{category_name}_role_level")
+        
+        # Save results
+        save_results(user_level_df, category_name, "user_level")
+        save_results(role_level_df, category_name, "role_level")
+        
+        # Print summary statistics
+        logger.info(f"\nSummary for {category_name}:")
+        
+        # User-level summary
+        logger.info("\nUser-level analysis:")
+        logger.info(f"Total cases analyzed: {len(user_level_df)}")
+        logger.info(f"Average case duration: {user_level_df['duration'].mean():.2f} hours")
+        logger.info(f"Average handovers per case: {user_level_df['total_handovers'].mean():.2f}")
+        logger.info(f"Average unique handovers per case: {user_level_df['unique_handovers'].mean():.2f}")
+        
+        # Role-level summary
+        logger.info("\nRole-level analysis:")
+        logger.info(f"Total cases analyzed: {len(role_level_df)}")
+        logger.info(f"Average case duration: {role_level_df['duration'].mean():.2f} hours")
+        logger.info(f"Average handovers per case: {role_level_df['total_handovers'].mean():.2f}")
+        logger.info(f"Average unique handovers per case: {role_level_df['unique_handovers'].mean():.2f}")
+        
+        # Perform statistical analysis
+        stats_results = perform_statistical_analysis(user_level_df, {'total_handovers': user_level_correlation})
+        logger.info("\nStatistical Analysis:")
+        logger.info(f"Correlation between total handovers and duration: {stats_results['correlations']['total_handovers'][0]:.3f} (p-value: {stats_results['correlations']['total_handovers'][1]:.3f})")
+        logger.info(f"Correlation between unique handovers and duration: {stats_results['correlations']['unique_handovers'][0]:.3f} (p-value: {stats_results['correlations']['unique_handovers'][1]:.3f})")
+        logger.info(f"ANOVA F-statistic: {stats_results['anova'][0]:.3f} (p-value: {stats_results['anova'][1]:.3f})")
+        
+        return category_name, {
+            'user_level': user_level_df,
+            'role_level': role_level_df,
+            'statistics': stats_results
+        }
+        
+    except Exception as e:
+        logger.error(f"Error processing {category_name}: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return category_name, None
+
 def main():
     """Main function to analyze handovers and their relationship with case duration."""
     logger.info("Starting handover-duration analysis")
@@ -249,85 +441,11 @@ def main():
     # Store results for all categories
     all_results = {}
     
-    for category_name, category_files in ITEM_CATEGORIES.items():
-        logger.info(f"\nProcessing category: {category_name}")
-        
-        # Find and load the XES file
-        xes_file = os.path.join(INPUT_DIR, category_files[0])
-        
-        if not os.path.exists(xes_file):
-            logger.warning(f"File not found: {xes_file}")
-            continue
-            
-        try:
-            # Load and analyze the log
-            logger.info(f"Loading log file: {xes_file}")
-            log = xes_importer.apply(xes_file)
-            logger.info(f"Successfully loaded log with {len(log)} cases")
-            
-            # Print some debug information about the first case
-            if len(log) > 0:
-                first_case = log[0]
-                logger.info("\nDebug - First case attributes:")
-                for key, value in first_case.attributes.items():
-                    logger.info(f"{key}: {value}")
-                logger.info("\nDebug - First case events:")
-                for i, event in enumerate(list(first_case)[:5]):
-                    logger.info(f"Event {i}:")
-                    for key, value in event.items():
-                        logger.info(f"  {key}: {value}")
-            
-            # Analyze handovers and duration
-            user_level_df, role_level_df = analyze_handovers_and_duration(log, category_name)
-            
-            # Print summary of the dataframes
-            logger.info("\nUser-level DataFrame Summary:")
-            logger.info(user_level_df.describe())
-            logger.info("\nRole-level DataFrame Summary:")
-            logger.info(role_level_df.describe())
-            
-            # Create visualizations
-            create_visualizations(user_level_df, f"{category_name}_user_level")
-            create_visualizations(role_level_df, f"{category_name}_role_level")
-            
-            # Save results
-            user_level_df.to_csv(os.path.join(OUTPUT_DIR, f"duration_{category_name}_user_level.csv"), index=False)
-            role_level_df.to_csv(os.path.join(OUTPUT_DIR, f"duration_{category_name}_role_level.csv"), index=False)
-            
-            # Print summary statistics
-            logger.info(f"\nSummary for {category_name}:")
-            
-            # User-level summary
-            logger.info("\nUser-level analysis:")
-            logger.info(f"Total cases analyzed: {len(user_level_df)}")
-            logger.info(f"Average case duration: {user_level_df['duration'].mean():.2f} hours")
-            logger.info(f"Average handovers per case: {user_level_df['total_handovers'].mean():.2f}")
-            logger.info(f"Average unique handovers per case: {user_level_df['unique_handovers'].mean():.2f}")
-            
-            # Role-level summary
-            logger.info("\nRole-level analysis:")
-            logger.info(f"Total cases analyzed: {len(role_level_df)}")
-            logger.info(f"Average case duration: {role_level_df['duration'].mean():.2f} hours")
-            logger.info(f"Average handovers per case: {role_level_df['total_handovers'].mean():.2f}")
-            logger.info(f"Average unique handovers per case: {role_level_df['unique_handovers'].mean():.2f}")
-            
-            # Perform statistical analysis
-            stats_results = perform_statistical_analysis(user_level_df)
-            logger.info("\nStatistical Analysis:")
-            logger.info(f"Correlation between total handovers and duration: {stats_results['correlations']['total_handovers'][0]:.3f} (p-value: {stats_results['correlations']['total_handovers'][1]:.3f})")
-            logger.info(f"Correlation between unique handovers and duration: {stats_results['correlations']['unique_handovers'][0]:.3f} (p-value: {stats_results['correlations']['unique_handovers'][1]:.3f})")
-            logger.info(f"ANOVA F-statistic: {stats_results['anova'][0]:.3f} (p-value: {stats_results['anova'][1]:.3f})")
-            
-            all_results[category_name] = {
-                'user_level': user_level_df,
-                'role_level': role_level_df,
-                'statistics': stats_results
-            }
-            
-        except Exception as e:
-            logger.error(f"Error processing {category_name}: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+    # Each category is an independent file, so the categories are processed in parallel
+    with ProcessPoolExecutor(max_workers=max(1, min(CATEGORY_WORKERS, len(ITEM_CATEGORIES)))) as executor:
+        for category_name, results in executor.map(process_category, ITEM_CATEGORIES.items()):
+            if results is not None:
+                all_results[category_name] = results
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -22,17 +22,26 @@ ANALYSIS_DIR = './data/analysis/handover_duration'
 OUTPUT_DIR = './data/analysis/correlation'
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Columns of the duration data used in the correlation analysis
+DURATION_COLUMNS = ['total_handovers', 'duration']
+
+def load_role_level_data(category):
+    """Load the role-level duration data of a category, from its parquet copy when that is up to date."""
+    csv_file = os.path.join(ANALYSIS_DIR, f'duration_{category}_role_level.csv')
+    parquet_file = os.path.join(ANALYSIS_DIR, f'duration_{category}_role_level.parquet')
+    if os.path.exists(parquet_file) and (not os.path.exists(csv_file) or os.path.getmtime(parquet_file) >= os.path.getmtime(csv_file)):
+        return pd.read_parquet(parquet_file, columns=DURATION_COLUMNS)
+    return pd.read_csv(csv_file, usecols=DURATION_COLUMNS)
+
 def load_data():
     """Load duration data for 3-way before and after cases."""
     data = {}
     
     # Load 3-way before data
-    before_file = os.path.join(ANALYSIS_DIR, 'duration_3_way_before_role_level.csv')
-    data['before'] = pd.read_csv(before_file)
+    data['before'] = load_role_level_data('3_way_before')
     
     # Load 3-way after data
-    after_file = os.path.join(ANALYSIS_DIR, 'duration_3_way_after_role_level.csv')
-    data['after'] = pd.read_csv(after_file)
+    data['after'] = load_role_level_data('3_way_after')
     
     return data
 
@@ -47,8 +56,8 @@ def analyze_correlation(df, category):
         'mean_handovers': df['total_handovers'].mean()
     }
 
-def create_regression_plot(df_before, df_after):
-    """Create regression plots for both categories."""
+def create_regression_plot(df_before, df_after, corr_before, corr_after):
+    """Create regression plots for both categories, annotated with their (correlation, p-value)."""
     # Set up the plot with two subplots
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
     
@@ -68,10 +77,6 @@ def create_regression_plot(df_before, df_after):
                 ax=ax2,
                 label='3-way after GR')
     
-    # Calculate correlations
-    corr_before = stats.pearsonr(df_before['total_handovers'], df_before['duration'])
-    corr_after = stats.pearsonr(df_after['total_handovers'], df_after['duration'])
-    
     # Add correlation information to each subplot
     ax1.text(0.05, 0.95, 
              f'Correlation: {corr_before[0]:.3f}\np-value: {corr_before[1]:.3e}',
@@ -119,7 +124,9 @@ def main():
     
     # Create visualization
     print("\nCreating regression plot...")
-    create_regression_plot(data['before'], data['after'])
+    create_regression_plot(data['before'], data['after'],
+                           (results[0]['correlation'], results[0]['p_value']),
+                           (results[1]['correlation'], results[1]['p_value']))
     print(f"Plot saved to {os.path.join(OUTPUT_DIR, 'handover_duration_correlation.png')}")
 
 if __name__ == "__main__":
@@ -7,19 +7,23 @@ identifying critical points in the process where work transfers between differen
 """
 
 import os
+import sys
 import logging
+from functools import lru_cache
 from collections import Counter, defaultdict
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-from pm4py.objects.log.importer.xes import importer as xes_importer
-from pm4py.util import constants
+import pm4py
 import scipy.stats as stats
 from scipy import stats
-from datetime import datetime
 import networkx as nx
 
+# The XES import helpers shared by the scripts are in analyze_logs.py in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyze_logs import XES_IMPORT_VARIANT
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -47,8 +51,16 @@ FILE_MAPPING = {
     'consignment': 'group_consignment.xes'
 }
 
+# Event DataFrame columns
+CASE_ID_KEY = 'case:concept:name'
+ACTIVITY_KEY = 'concept:name'
+TIMESTAMP_KEY = 'time:timestamp'
+RESOURCE_KEY = 'org:resource'
+ROLE_KEY = 'userRole'
+
+@lru_cache(maxsize=None)
 def get_role(resource):
-    """Extract role from resource identifier."""
+    """Extract role from resource identifier (cached, as logs hold few distinct resources)."""
     if resource == "NONE" or not resource:
         return "NONE"
     if resource.startswith("batch"):
@@ -66,7 +78,7 @@ def analyze_handover_keypoints(log, category_name):
     Analyze activity transitions where handovers occur between roles.
     
     Args:
-        log: PM4Py event log
+        log: Event DataFrame with the events of each case in consecutive rows
         category_name: Name of the process category
         
     Returns:
@@ -74,44 +86,31 @@ def analyze_handover_keypoints(log, category_name):
     """
     logger.info(f"Analyzing handover keypoints for {category_name}")
     
-    # Store handover transitions
-    handover_transitions = []
+    # Events without a resource count as "NONE"
+    resources = log.reindex(columns=[RESOURCE_KEY])[RESOURCE_KEY].astype(object).fillna("NONE")
+    
+    # Derive the role of each distinct resource only once and encode cases and roles as integer codes,
+    # so the handover scan compares integers instead of strings
+    case_codes, _ = pd.factorize(log[CASE_ID_KEY])
+    resource_codes, resource_names = pd.factorize(resources)
+    role_of_resource, role_names = pd.factorize(pd.Index(resource_names).map(get_role))
+    role_codes = role_of_resource[resource_codes]
+    activities = log[ACTIVITY_KEY].to_numpy()
+    logger.info(f"Processing {len(log)} events")
+    
+    # Pair every event with the next event of the same case (consecutive rows),
+    # a handover is a change of role between the two
+    is_handover = (case_codes[:-1] == case_codes[1:]) & (role_codes[:-1] != role_codes[1:])
+    df = pd.DataFrame({
+        'from_activity': activities[:-1][is_handover],
+        'to_activity': activities[1:][is_handover],
+        'from_role': role_names[role_codes[:-1][is_handover]],
+        'to_role': role_names[role_codes[1:][is_handover]]
+    })
+    
+    # Detailed information per activity transition, filled from the role combinations below
     handover_details = defaultdict(lambda: {'total': 0, 'roles': defaultdict(int)})
     
-    for case_idx, case in enumerate(log):
-        if case_idx % 1000 == 0:
-            logger.info(f"Processing case {case_idx} of {len(log)}")
-        
-        events = list(case)
-        for i in range(len(events) - 1):
-            current_event = events[i]
-            next_event = events[i + 1]
-            
-            # Get activities and roles
-            current_activity = current_event["concept:name"]
-            next_activity = next_event["concept:name"]
-            current_role = get_role(current_event.get("org:resource", "NONE"))
-            next_role = get_role(next_event.get("org:resource", "NONE"))
-            
-            # Record transition if there's a role handover
-            if current_role != next_role:
-                transition = (current_activity, next_activity)
-                handover_transitions.append({
-                    'from_activity': current_activity,
-                    'to_activity': next_activity,
-                    'from_role': current_role,
-                    'to_role': next_role
-                })
-                
-                # Store detailed information
-                key = f"{current_activity} → {next_activity}"
-                role_key = f"{current_role} → {next_role}"
-                handover_details[key]['total'] += 1
-                handover_details[key]['roles'][role_key] += 1
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(handover_transitions)
-    
     if len(df) == 0:
         logger.warning(f"No handover transitions found for {category_name}")
         return pd.DataFrame(), pd.DataFrame(), handover_details
@@ -124,6 +123,13 @@ def analyze_handover_keypoints(log, category_name):
     # Calculate role combinations for each transition
     role_combinations = df.groupby(['from_activity', 'to_activity', 'from_role', 'to_role']).size().reset_index(name='role_frequency')
     
+    # Store detailed information
+    for from_activity, to_activity, from_role, to_role, role_frequency in role_combinations.itertuples(index=False):
+        key = f"{from_activity} → {to_activity}"
+        role_key = f"{from_role} → {to_role}"
+        handover_details[key]['total'] += role_frequency
+        handover_details[key]['roles'][role_key] += role_frequency
+    
     # Sort by frequency
     transition_counts = transition_counts.sort_values('frequency', ascending=False)
     
@@ -157,76 +163,39 @@ def create_visualizations(transition_counts, role_combinations, category_name):
     
     return top_5
 
-def calculate_case_duration(case):
-    """Calculate the duration of a case in hours."""
-    timestamps = []
-    for event in case:
-        timestamp_str = event["time:timestamp"]
-        if isinstance(timestamp_str, str):
-            try:
-                # Try different timestamp formats
-                if 'Z' in timestamp_str:
-                    timestamp_str = timestamp_str.replace('Z', '+00:00')
-                elif '+' not in timestamp_str and '-' not in timestamp_str[-6:]:
-                    timestamp_str = timestamp_str + '+00:00'
-                
-                # Parse the timestamp
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                except ValueError:
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S%z')
-                    except ValueError:
-                        timestamp = datetime.strptime(timestamp_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                
-                timestamps.append(timestamp)
-            except Exception as e:
-                logger.debug(f"Error parsing timestamp: {timestamp_str} - {str(e)}")
-                continue
-        elif isinstance(timestamp_str, datetime):
-            timestamps.append(timestamp_str)
-    
-    if len(timestamps) < 2:
-        return None
-    
-    duration = (max(timestamps) - min(timestamps)).total_seconds() / 3600
-    return duration if duration > 0 else None
-
 def analyze_handover_duration_correlation(log, category_name):
     """Analyze correlation between handovers and case duration."""
-    case_stats = []
-    total_cases = len(log)
-    valid_cases = 0
-    invalid_cases = 0
-    
-    for case in log:
-        # Calculate number of handovers
-        handovers = 0
-        events = list(case)
-        for i in range(len(events) - 1):
-            current_role = events[i].get("userRole", "UNKNOWN")
-            next_role = events[i + 1].get("userRole", "UNKNOWN")
-            if current_role != next_role:
-                handovers += 1
-        
-        # Calculate case duration
-        duration = calculate_case_duration(case)
-        
-        if duration is not None and handovers > 0:
-            case_stats.append({
-                'handovers': handovers,
-                'duration': duration
-            })
-            valid_cases += 1
-        else:
-            invalid_cases += 1
+    # Number the cases in order of appearance
+    case_codes, case_ids = pd.factorize(log[CASE_ID_KEY])
+    total_cases = len(case_ids)
+    
+    # Count the changes of user role between consecutive events of a case
+    # (events without a role count as "UNKNOWN")
+    roles = log.reindex(columns=[ROLE_KEY])[ROLE_KEY].astype(object).fillna("UNKNOWN")
+    role_codes, _ = pd.factorize(roles)
+    is_handover = (case_codes[:-1] == case_codes[1:]) & (role_codes[:-1] != role_codes[1:])
+    handovers = np.bincount(case_codes[:-1][is_handover], minlength=total_cases)
+    
+    # Duration of each case in hours (time between its first and last timestamp)
+    case_timestamps = log.groupby(case_codes)[TIMESTAMP_KEY]
+    durations = ((case_timestamps.max() - case_timestamps.min()).dt.total_seconds() / 3600).to_numpy()
+    timestamp_counts = case_timestamps.count().to_numpy()
+    
+    # Only cases with a positive duration and at least one handover are used
+    is_valid = (timestamp_counts >= 2) & (durations > 0) & (handovers > 0)
+    case_stats = pd.DataFrame({
+        'handovers': handovers[is_valid],
+        'duration': durations[is_valid]
+    })
+    valid_cases = int(is_valid.sum())
+    invalid_cases = total_cases - valid_cases
     
     if len(case_stats) < 2:
         logger.warning(f"Not enough valid cases for correlation analysis in {category_name}")
         logger.warning(f"Total cases: {total_cases}, Valid: {valid_cases}, Invalid: {invalid_cases}")
         return None, None, 0
     
-    df = pd.DataFrame(case_stats)
+    df = case_stats
     
     try:
         # Calculate correlation and p-value
@@ -355,8 +324,8 @@ def main():
         try:
             # Load and analyze the log
             logger.info(f"Loading log file: {xes_file}")
-            log = xes_importer.apply(xes_file)
-            logger.info(f"Successfully loaded log with {len(log)} cases")
+            log = pm4py.read_xes(xes_file, variant=XES_IMPORT_VARIANT, return_legacy_log_object=False)
+            logger.info(f"Successfully loaded log with {log[CASE_ID_KEY].nunique()} cases")
             
             # Analyze handover keypoints
             transition_counts, role_combinations, handover_details = analyze_handover_keypoints(log, category_name)
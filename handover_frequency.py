@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 from pm4py.objects.log.importer.xes import importer as xes_importer
 import glob
 from collections import defaultdict
+from operator import itemgetter
 
 # Paths
 INPUT_FOLDER = 'data/filtered/preprocessed_handover/preprocessed_categorized_logs'
@@ -14,8 +15,19 @@ WHOLE_PROCESS = False
 
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# itemgetter is called from C by map(), skipping a Python-level lookup per event
+GET_ROLE = itemgetter('userRole')
+GET_TIMESTAMP = itemgetter('time:timestamp')
+
+def get_event_values(trace, getter, key):
+    # Fast path for traces where every event has the attribute, otherwise skip the events without it
+    try:
+        return list(map(getter, trace))
+    except KeyError:
+        return [event[key] for event in trace if key in event]
+
 def calculate_handovers(trace):
-    roles = [event['userRole'] for event in trace if 'userRole' in event]
+    roles = get_event_values(trace, GET_ROLE, 'userRole')
     if len(roles) < 2:
         print(len(roles))
     handovers_between_roles = 0
@@ -34,7 +46,7 @@ def calculate_case_duration(trace):
     if len(trace) < 2:
         return 0, 1
     else:
-        timestamps = [event['time:timestamp'] for event in trace if 'time:timestamp' in event]
+        timestamps = get_event_values(trace, GET_TIMESTAMP, 'time:timestamp')
         if len(timestamps) < 2:
              0, 1
         else:
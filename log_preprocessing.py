@@ -23,8 +23,7 @@ from datetime import datetime
 import json
 import pm4py
 from pm4py.objects.log.obj import EventLog
-from analyze_logs import count_events
-from pm4py.objects.log.importer.xes import importer as xes_importer
+from analyze_logs import count_events, XES_IMPORT_VARIANT
 
 # ---------------------------
 # CONFIGURATION SETTINGS
@@ -104,8 +103,8 @@ def process_xes_file(input_file, output_dir):
     # Step 1: Import XES file
     logger.info(f"Importing XES file: {input_file}")
     try:
-        # Import the log
-        log = xes_importer.apply(input_file)
+        # Import the log (rustxes when installed, the rest of the script iterates over cases so keep the EventLog object)
+        log = pm4py.read_xes(input_file, variant=XES_IMPORT_VARIANT, return_legacy_log_object=True)
         
         case_count = len(log)
         event_count = count_events(log)